@@ -24,30 +24,56 @@ SOFTWARE.
 
 
 from .RegularExpression.Graph import Graph, GraphOperator, Edge, NODE_TAG
-from .RegularExpression.BaseOperator import ReorganizeGraphEdge, CopyGraph, MergeGraph, MergeEdgeAllowSet
-from .RegularExpression.SpecialOperator import MakeVirtualStartNode, AddDataToEndNode
+from .RegularExpression.CharClass import CharClass, Alphabet
+from .RegularExpression.BaseOperator import ReorganizeGraphEdge, MergeGraph, MergeEdgeAllowSet
+from .RegularExpression.SpecialOperator import MakeVirtualStartNode, AddDataToEndNode, DeadStateCut, EliminateEpsilon
 from .RegularExpression.SpecialCompute import GetStartNodes
-from .RegularExpression.Function import getRandomString, dealWithConflict
+from .RegularExpression.Function import dealWithConflict
 from .RegularExpression.Exp2NFA import Exp2NFA
+from .RegularExpression.Exp2DFA import Exp2DFA
+from .RegularExpression.Interpreter import ExpressionPool
 from .RegularExpression.NFA2DFA import SubsetConstruction
 from .RegularExpression.SimplifyDFA import Brzozowski
+from .RegularExpression.Pipeline import Pipeline
+from .RegularExpression.Utf8 import Utf8Encode
 
 from kit.MQKit import MQSever, Message, MQ_TYPE
 
+class PublishGraph(GraphOperator):
+    """
+    将当前的图合并同向边后发布到 Lex_Graph_Pipe，原样返回输入的图
+    没有订阅者时不进行序列化
+    """
+
+    def __init__(self, title: str):
+        self.title = title
+        super().__init__()
+
+    def operate(self, g: Graph | None = None) -> Graph:
+        if not MQSever.subscribed(MQ_TYPE.Lex_Graph_Pipe):
+            return g
+        MQSever.publish(MQ_TYPE.Lex_Graph_Pipe, Message(self.title, MergeEdgeAllowSet().operate(g).to_json()))
+        return g
+
+
 class Lex:
     """
     中介模式，提供用户调用的主要接口
     """
 
-    def __init__(self, raw):
+    def __init__(self, raw, direct: bool = False):
+        """
+        :param direct: 为 True 时每条规则使用 Exp2DFA 由 followpos 直接构造DFA，跳过NFA和第一次子集构造
+        """
         self.expr_list = []
         self.raw = raw
+        self.direct = direct
         self.expr_list = self.parse()
         self.graph = self.compile()
 
     @staticmethod
     def read_file(filename):
-        with open(filename, 'r') as f:
+        with open(filename, 'r', encoding='utf-8') as f:
             return f.read()
 
     def parse(self):
@@ -69,29 +95,58 @@ class Lex:
 
     def compile(self):
         g = Graph()
+        self.pipelines = []
+        self.pool = ExpressionPool()  # 所有规则共享相同的子表达式
         for idx, (expr, raw) in enumerate(self.expr_list):
             expr = self.getExpr(expr)
-            gt = Exp2NFA(expr).operate()  # 根据正则表达式生成图
-            MQSever.publish(MQ_TYPE.Lex_Graph_Pipe, Message(f"NFA::{raw}", MergeEdgeAllowSet().operate(gt).to_json()))  # 存储NFA图
-            gt = ReorganizeGraphEdge().operate(gt)  # 将图的边进行化简
-            gt = SubsetConstruction(lambda a, b: a).operate(gt)  # NFA 转 DFA
-            MQSever.publish(MQ_TYPE.Lex_Graph_Pipe, Message(f"DFA::{raw}", MergeEdgeAllowSet().operate(gt).to_json()))  # 存储NFA图
-            gt = Brzozowski().operate(gt)  # 最简化DFA Brzozowski算法
-            MQSever.publish(MQ_TYPE.Lex_Graph_Pipe, Message(f"SDFA::{raw}", MergeEdgeAllowSet().operate(gt).to_json()))  # 存储NFA图
-            gt = AddDataToEndNode(raw, idx).operate(gt)  # 添加标签
-            # 复制图合并到g中
-            g = MergeGraph(g).operate(CopyGraph(getRandomString(5)).operate(gt))
-        # print(111, g)
-        g = ReorganizeGraphEdge().operate(g)
-        g = MakeVirtualStartNode().operate(g)  # 添加起始虚拟节点
-        g = SubsetConstruction(dealWithConflict).operate(g)  # 再进行一次 NFA 化简 DFA
-        g = MergeEdgeAllowSet().operate(g)  # 最后进行一次相同边但不同allow的合并操作
-        MQSever.publish(MQ_TYPE.Lex_Graph_Pipe, Message(f"SDFA", g.to_json()))  # 存储合并后的最后SDFA
+            if self.direct:
+                front = (
+                    Exp2DFA(expr, pool=self.pool, simplify=True),  # 根据正则表达式直接生成DFA
+                )
+            else:
+                front = (
+                    Exp2NFA(expr, pool=self.pool, simplify=True),  # 根据正则表达式生成图
+                    PublishGraph(f"NFA::{raw}"),  # 存储NFA图
+                    EliminateEpsilon(inplace=True),  # 消除空边，子集构造不再需要求空闭包
+                    ReorganizeGraphEdge(inplace=True),  # 将图的边进行化简
+                    SubsetConstruction(lambda a, b: a),  # NFA 转 DFA
+                    DeadStateCut(inplace=True),  # 删除无法到达终止状态的死状态
+                )
+            pipeline = Pipeline(
+                *front,
+                PublishGraph(f"DFA::{raw}"),  # 存储DFA图
+                Utf8Encode(inplace=True),  # 非 ASCII 字符转换为 UTF-8 字节序列
+                Brzozowski(),  # 最简化DFA Brzozowski算法
+                PublishGraph(f"SDFA::{raw}"),  # 存储最简DFA图
+                AddDataToEndNode(raw, idx),  # 添加标签
+            )
+            gt = pipeline.operate()
+            self.pipelines.append(pipeline)
+            # 将图的状态编号偏移后合并到g中
+            g = MergeGraph(g).operate(gt)
+        pipeline = Pipeline(
+            ReorganizeGraphEdge(inplace=True),
+            MakeVirtualStartNode(),  # 添加起始虚拟节点
+            EliminateEpsilon(dealWithConflict, inplace=True),  # 消除虚拟节点引入的空边
+            SubsetConstruction(dealWithConflict),  # 再进行一次 NFA 化简 DFA
+            MergeEdgeAllowSet(inplace=True),  # 最后进行一次相同边但不同allow的合并操作
+            DeadStateCut(inplace=True),  # 生成代码前删除死状态
+        )
+        g = pipeline.operate(g)
+        self.pipelines.append(pipeline)
+        if MQSever.subscribed(MQ_TYPE.Lex_Graph_Pipe):
+            MQSever.publish(MQ_TYPE.Lex_Graph_Pipe, Message(f"SDFA", g.to_json()))  # 存储合并后的最后SDFA
 
         self.graph = g
 
         return g
 
+    def report(self) -> str:
+        """
+        各条规则以及最终合并阶段的编译耗时统计
+        """
+        return '\n\n'.join(p.report() for p in self.pipelines)
+
     def generate_lex(self) -> (str, str):
         """
         生成词法分析程序
@@ -103,9 +158,9 @@ class Lex:
         code = ''
         st = st_nodes[0]
         edge_list = []
-        state_map = {n.name: i for i, n in enumerate(self.graph.getAllNodes())}
+        state_map = {n.id: i for i, n in enumerate(self.graph.getAllNodes())}
         done = set()
-        qu = [st.name]
+        qu = [st.id]
         while qu:
             pos = qu.pop(0)
             if pos in done:
@@ -131,17 +186,19 @@ class Lex:
                 code += f"{{ undoGetChar(c); *p = 0; error(\"Lex Error\"); }}\n"
             code += "break;\n"
 
+        # 转移表只记录每条边包含哪些字符等价类，字节到等价类的映射由 256 项的 char_class 表给出
+        alphabet = self.graph.alphabet()
         array_code = "{\n"
         for i, e in enumerate(edge_list):
-            array_code += self.allow_set_to_bitmap(e.allow) + ',\n'
+            array_code += self.allow_set_to_bitmap(e.allow, alphabet) + ',\n'
         array_code += '}'
-        return dict(code=code, array=array_code)
+        classes_code = '{' + ','.join(map(str, alphabet.table(256))) + '}'
+        return dict(code=code, array=array_code, classes=classes_code, class_count=str(len(alphabet)))
 
     @staticmethod
-    def allow_set_to_bitmap(allow: set):
-        ans = [0] * 16
-        for c in allow:
-            ans[ord(c) // 8] |= (1 << (ord(c) % 8))
+    def allow_set_to_bitmap(allow: CharClass, alphabet: Alphabet):
+        # 多留一位给不属于任何类的字符，保证至少有一个字节
+        ans = CharClass.from_mask(alphabet.class_mask(allow)).to_bitmap(len(alphabet) // 8 + 1)
         return '{' + ','.join(map(str, ans)) + '}'
 
     @staticmethod
@@ -156,5 +213,5 @@ class Lex:
 
     def saveLex(self, filename):
         code = self.getLex()
-        with open(filename, 'w') as f:
+        with open(filename, 'w', encoding='utf-8') as f:
             f.write(code)
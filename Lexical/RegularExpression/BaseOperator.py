@@ -25,39 +25,46 @@ SOFTWARE.
 
 from __future__ import annotations
 
-from typing import List
+from typing import List, Dict
 
-from .Graph import Graph, GraphOperator, NODE_TAG, Query, Edge
-from .Function import getHash
-import hashlib
+from .Graph import Graph, GraphOperator, GraphBuilder, NODE_TAG, Edge
+from .CharClass import CharClass, Alphabet
 
 
 
 class CopyGraph(GraphOperator):
     """
     实现复制Graph对象内的所有节点和边的操作。
+    复制时所有状态编号加上 offset，不再对节点重新哈希命名
+    keep_names=False 时丢弃名称表，复制出的节点全部为匿名节点
+    inplace=True 时不复制，直接对 g 重新编号
     >>> g = Graph()
     >>> c = CopyGraph().operate(g)
     """
-    def __init__(self, padding=''):
-        self.padding = padding
-        super().__init__()
+    def __init__(self, offset=0, keep_names=True, inplace=False):
+        self.offset = offset
+        self.keep_names = keep_names
+        super().__init__(inplace)
 
     def operate(self, g: Graph | None = None) -> Graph:
         assert g is not None
-        nodes = g.getAllNodes()
-        edges = g.getAllEdges()
-        g = Graph()
-        for n in nodes:
-            g.node(getHash(n.name + self.padding), n.tag, n.data)
-        for e in edges:
-            g.edge(getHash(e.fr + self.padding), getHash(e.to + self.padding), e.allow, e.data)
-        return g
+        if self.inplace:
+            if self.offset or not self.keep_names:
+                g.renumber(self.offset, self.keep_names)
+            return g
+        builder = GraphBuilder()
+        for n in g.getAllNodes():
+            builder.addNode(n.label if self.keep_names else None, n.tag, n.data, n.id + self.offset)
+        for e in g.getAllEdges():
+            builder.addEdge(e.fr + self.offset, e.to + self.offset, e.allow, e.data)
+        return builder.build()
 
 
 class MergeGraph(GraphOperator):
     """
     合并两个或多个复合图，将顶点和边合并到一个新的图中。
+    被合并图的状态编号整体偏移 offset，默认偏移到 g.next_id 之后，
+    operate 之后可以通过 self.offset 获得实际使用的偏移量
     >>> g0 = Graph()
     >>> g1 = Graph()
     >>> g2 = MergeGraph(g0).operate(g1)
@@ -65,18 +72,22 @@ class MergeGraph(GraphOperator):
     True
     """
 
-    def __init__(self, g: Graph):
+    def __init__(self, g: Graph, offset=None):
         self.g = g
+        self.offset = offset
         super().__init__()
 
     def operate(self, g: Graph | None = None) -> Graph:
+        if self.offset is None:
+            self.offset = self.g.next_id
+        builder = GraphBuilder()
         for n in g.getAllNodes():
-            self.g.node(n.name, n.tag, n.data)
+            builder.addNode(n.label, n.tag, n.data, n.id + self.offset)
 
         for e in g.getAllEdges():
-            self.g.edge(e.fr, e.to, e.allow, e.data)
+            builder.addEdge(e.fr + self.offset, e.to + self.offset, e.allow, e.data)
 
-        return self.g
+        return builder.load(self.g)
 
 
 class MakeSameTag(GraphOperator):
@@ -85,12 +96,15 @@ class MakeSameTag(GraphOperator):
     >>> g = Graph()
     >>> g = MakeSameTag(NODE_TAG.NORMAL).operate(g)
     """
+
+    MUTATES_INPUT = True
+
     def __init__(self, tag):
         self.tag = tag
         super().__init__()
 
     def operate(self, g: Graph | None = None) -> Graph:
-        g.nodes.update(dict(tag=self.tag), Query().tag != self.tag)
+        g.setAllTags(self.tag)
         return g
 
 
@@ -111,38 +125,42 @@ class ReorganizeGraphEdge(GraphOperator):
 
     def operate(self, g: Graph | None = None) -> Graph:
         edges = g.getAllEdges()
-        allows = list(filter(lambda x: x, map(lambda e: e.allow, edges)))
-        allows = self.divsSet(*allows)
-        new_edges = []
+        alphabet = Alphabet(dict.fromkeys(e.allow for e in edges if e.allow))
+        if self.inplace:
+            return self._operate_inplace(g, edges, alphabet)
+        new_edges = {}  # Edge 可哈希，使用有序 dict 去重
         for e in edges:
             a = e.allow
             if a is None:
-                new_edges.append(e)
+                new_edges[e] = None
                 continue
-            for s in allows:
-                if a & s:
-                    et = Edge(e.fr, e.to, s, e.data)
-                    if et not in new_edges:
-                        new_edges.append(et)
+            for s in alphabet.split(a):
+                new_edges[Edge(e.fr, e.to, s, e.data)] = None
         return Graph(g.getAllNodes(), new_edges)
 
     @staticmethod
-    def divsSet(*args):
-        elements = set()
-        for st in args:
-            for e in st:
-                elements.add(e)
-        arr = {_: hashlib.sha256(b'zero') for _ in elements}
-        for i, st in enumerate(args):
-            for e in st:
-                arr[e].update(str(i).encode())
-        mp = {}
-        for e, h in arr.items():
-            hs = h.hexdigest()
-            if hs not in mp:
-                mp[hs] = set()
-            mp[hs].add(e)
-        return list(map(lambda x: x[1], mp.items()))
+    def _operate_inplace(g: Graph, edges: List[Edge], alphabet: Alphabet) -> Graph:
+        # 只删除需要拆分的边和重复的边，已经是单个划分块的边保持不动
+        seen = set()
+        for e in edges:
+            a = e.allow
+            pieces = [a] if a is None else alphabet.split(a)
+            if len(pieces) == 1 and pieces[0] == a:
+                if e in seen:
+                    g.removeEdge(e)
+                seen.add(e)
+                continue
+            g.removeEdge(e)
+            for s in pieces:
+                ne = Edge(e.fr, e.to, s, e.data)
+                if ne not in seen:
+                    seen.add(ne)
+                    g.edge(ne.fr, ne.to, ne.allow, ne.data)
+        return g
+
+    @staticmethod
+    def divsSet(*args) -> List[CharClass]:
+        return Alphabet(args).classes
 
 class MergeEdgeAllowSet(GraphOperator):
     """
@@ -160,20 +178,26 @@ class MergeEdgeAllowSet(GraphOperator):
     """
 
     def operate(self, g: Graph | None = None) -> Graph:
-        edges_set = set([
-            (e.fr, e.to) for e in g.getAllEdges()
-        ])
-        new_edges: List[Edge] = []
-        new_none_edges: List[Edge] = []
-        for et in edges_set:
-            q = Query()
-            for e in map(lambda x: Edge(**x), g.edges.search(q.fr == et[0] and q.to == et[1])):
-                if e.allow is None:
-                    new_none_edges.append(e)
-                    continue
-                result = list(filter(lambda x: x.fr == e.fr and x.to == e.to and x.data == e.data, new_edges))
-                if result:
-                    result[0].allow.update(e.allow)
-                else:
-                    new_edges.append(Edge(e.fr, e.to, e.allow.copy(), e.data))
-        return Graph(g.getAllNodes(), new_edges + new_none_edges)
+        # 一次遍历按 (fr, to, data) 分组，空边原样保留
+        groups: Dict[tuple, List[Edge]] = {}
+        none_edges: List[Edge] = []
+        for e in g.getAllEdges():
+            if e.allow is None:
+                none_edges.append(e)
+            else:
+                groups.setdefault((e.fr, e.to, e.data), []).append(e)
+        if self.inplace:
+            merged = [_ for _ in groups.items() if len(_[1]) > 1]
+            g.removeEdges([e for _, group in merged for e in group])
+            for (fr, to, data), group in merged:
+                g.edge(fr, to, self.union(group), data)
+            return g
+        new_edges = [
+            group[0] if len(group) == 1 else Edge(fr, to, self.union(group), data)
+            for (fr, to, data), group in groups.items()
+        ]
+        return Graph(g.getAllNodes(), new_edges + none_edges)
+
+    @staticmethod
+    def union(edges: List[Edge]) -> CharClass:
+        return CharClass().union(*(e.allow for e in edges))
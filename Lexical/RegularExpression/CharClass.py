@@ -0,0 +1,293 @@
+"""
+MIT License
+
+Copyright (c) 2023 Csome陈绍民
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+
+
+from __future__ import annotations
+
+from typing import Dict, Iterable, Iterator, List, Tuple
+
+
+class CharClass:
+    """
+    不可变、可哈希的字符集合，使用整数位图存储，第 i 位表示码点为 i 的字符
+    并、交、差、相等判断都是一次整数运算
+    >>> a = CharClass('abc')
+    >>> b = CharClass.from_range('b', 'd')
+    >>> a & b
+    CharClass('bc')
+    >>> sorted(a | b)
+    ['a', 'b', 'c', 'd']
+    >>> a == {'a', 'b', 'c'}
+    True
+    """
+
+    __slots__ = ('_mask',)
+
+    def __init__(self, chars: Iterable = ()):
+        if isinstance(chars, CharClass):
+            mask = chars._mask
+        else:
+            mask = 0
+            for c in chars:
+                mask |= 1 << (c if isinstance(c, int) else ord(c))
+        object.__setattr__(self, '_mask', mask)
+
+    @classmethod
+    def from_mask(cls, mask: int) -> CharClass:
+        """
+        直接通过位图创建字符集合
+        """
+        ans = cls.__new__(cls)
+        object.__setattr__(ans, '_mask', mask)
+        return ans
+
+    @classmethod
+    def from_range(cls, lo, hi) -> CharClass:
+        """
+        创建闭区间 [lo, hi] 内所有字符的集合
+        """
+        lo = lo if isinstance(lo, int) else ord(lo)
+        hi = hi if isinstance(hi, int) else ord(hi)
+        if hi < lo:
+            return cls.from_mask(0)
+        return cls.from_mask(((1 << (hi - lo + 1)) - 1) << lo)
+
+    @property
+    def mask(self) -> int:
+        return self._mask
+
+    def __setattr__(self, key, value):
+        raise AttributeError("CharClass 是不可变对象")
+
+    def __reduce__(self):
+        return CharClass.from_mask, (self._mask,)
+
+    def __copy__(self):
+        return self
+
+    def __deepcopy__(self, memo):
+        return self
+
+    @staticmethod
+    def _coerce(other) -> int:
+        if isinstance(other, CharClass):
+            return other._mask
+        return CharClass(other)._mask
+
+    def __or__(self, other) -> CharClass:
+        return CharClass.from_mask(self._mask | self._coerce(other))
+
+    def __and__(self, other) -> CharClass:
+        return CharClass.from_mask(self._mask & self._coerce(other))
+
+    def __sub__(self, other) -> CharClass:
+        return CharClass.from_mask(self._mask & ~self._coerce(other))
+
+    def __xor__(self, other) -> CharClass:
+        return CharClass.from_mask(self._mask ^ self._coerce(other))
+
+    __ror__ = __or__
+    __rand__ = __and__
+    __rxor__ = __xor__
+
+    def union(self, *others) -> CharClass:
+        mask = self._mask
+        for other in others:
+            mask |= self._coerce(other)
+        return CharClass.from_mask(mask)
+
+    def intersection(self, *others) -> CharClass:
+        mask = self._mask
+        for other in others:
+            mask &= self._coerce(other)
+        return CharClass.from_mask(mask)
+
+    def difference(self, *others) -> CharClass:
+        mask = self._mask
+        for other in others:
+            mask &= ~self._coerce(other)
+        return CharClass.from_mask(mask)
+
+    def isdisjoint(self, other) -> bool:
+        return not self._mask & self._coerce(other)
+
+    def issubset(self, other) -> bool:
+        return not self._mask & ~self._coerce(other)
+
+    def __eq__(self, other):
+        if isinstance(other, CharClass):
+            return self._mask == other._mask
+        if isinstance(other, (set, frozenset)):
+            try:
+                return self._mask == CharClass(other)._mask
+            except TypeError:
+                return False
+        return NotImplemented
+
+    def __hash__(self):
+        return hash(self._mask)
+
+    def __bool__(self):
+        return self._mask != 0
+
+    def __len__(self):
+        return bin(self._mask).count('1')
+
+    def __contains__(self, c):
+        if not isinstance(c, int):
+            if not isinstance(c, str) or len(c) != 1:
+                return False
+            c = ord(c)
+        return c >= 0 and (self._mask >> c) & 1 == 1
+
+    def codes(self) -> Iterator[int]:
+        """
+        按从小到大的顺序遍历所有码点
+        """
+        mask = self._mask
+        while mask:
+            low = mask & -mask
+            yield low.bit_length() - 1
+            mask ^= low
+
+    def __iter__(self) -> Iterator[str]:
+        return map(chr, self.codes())
+
+    def ranges(self) -> List[Tuple[int, int]]:
+        """
+        将集合转换为有序的闭区间列表
+        >>> CharClass('abcx').ranges()
+        [(97, 99), (120, 120)]
+        """
+        ans = []
+        for c in self.codes():
+            if ans and ans[-1][1] + 1 == c:
+                ans[-1] = (ans[-1][0], c)
+            else:
+                ans.append((c, c))
+        return ans
+
+    def to_bitmap(self, size: int) -> bytes:
+        """
+        转换为 size 字节的小端位图，第 i 个字节的第 j 位表示码点 i * 8 + j
+        """
+        return self._mask.to_bytes(size, 'little')
+
+    def __repr__(self):
+        return "CharClass(%r)" % ''.join(self)
+
+
+class Alphabet:
+    """
+    一组字符集合对字母表的最小等价类划分：两个字符属于同一类，当且仅当它们同时属于或同时不属于每个输入集合
+    使用划分细化算法，每个输入集合只处理与它相交的类，分裂时只为较小的一半重新编号
+    class_of 是字符码点到类下标的映射，可以直接用来生成转移表
+    >>> a = Alphabet([CharClass('abc'), CharClass('bcd')])
+    >>> a.classes
+    [CharClass('a'), CharClass('bc'), CharClass('d')]
+    >>> a.split(CharClass('abc'))
+    [CharClass('a'), CharClass('bc')]
+    >>> a.class_of[ord('c')]
+    1
+    """
+
+    __slots__ = ('classes', 'class_of')
+
+    def __init__(self, sets: Iterable = ()):
+        masks: List[int] = []
+        class_of: Dict[int, int] = {}
+        covered = 0
+        for s in sets:
+            mask = s.mask if isinstance(s, CharClass) else CharClass(s).mask
+            rest = mask & covered
+            while rest:
+                low = rest & -rest
+                i = class_of[low.bit_length() - 1]
+                cls = masks[i]
+                rest &= ~cls
+                inside, outside = cls & mask, cls & ~mask
+                if not outside:
+                    continue
+                # 分裂，较大的一半保留原下标，较小的一半使用新下标
+                if bin(inside).count('1') < bin(outside).count('1'):
+                    inside, outside = outside, inside
+                masks[i] = inside
+                masks.append(outside)
+                for c in CharClass.from_mask(outside).codes():
+                    class_of[c] = len(masks) - 1
+            new = mask & ~covered
+            if new:
+                masks.append(new)
+                for c in CharClass.from_mask(new).codes():
+                    class_of[c] = len(masks) - 1
+                covered |= new
+        # 按最小码点排序，使划分结果与输入顺序无关
+        order = sorted(range(len(masks)), key=lambda i: masks[i] & -masks[i])
+        rank = {old: new for new, old in enumerate(order)}
+        self.classes: List[CharClass] = [CharClass.from_mask(masks[i]) for i in order]
+        self.class_of: Dict[int, int] = {c: rank[i] for c, i in class_of.items()}
+
+    def __len__(self):
+        return len(self.classes)
+
+    def __iter__(self) -> Iterator[CharClass]:
+        return iter(self.classes)
+
+    def indices(self, allow: CharClass) -> List[int]:
+        """
+        组成 allow 的所有类下标，allow 必须是若干个类的并集，代价与结果个数成正比
+        """
+        ans = []
+        rest = allow.mask
+        while rest:
+            low = rest & -rest
+            i = self.class_of[low.bit_length() - 1]
+            assert self.classes[i].mask & ~allow.mask == 0, "allow 不是等价类的并集"
+            ans.append(i)
+            rest &= ~self.classes[i].mask
+        return ans
+
+    def split(self, allow: CharClass) -> List[CharClass]:
+        """
+        将 allow 拆分为等价类
+        """
+        return [self.classes[_] for _ in self.indices(allow)]
+
+    def class_mask(self, allow: CharClass) -> int:
+        """
+        allow 对应的类位图，第 i 位表示是否包含第 i 个类
+        """
+        ans = 0
+        for i in self.indices(allow):
+            ans |= 1 << i
+        return ans
+
+    def table(self, size: int) -> List[int]:
+        """
+        码点 0..size-1 到类下标的稠密映射表，不属于任何类的字符映射为 len(self)
+        """
+        return [self.class_of.get(c, len(self.classes)) for c in range(size)]
+
+    def __repr__(self):
+        return "Alphabet(%r)" % self.classes
@@ -30,4 +30,13 @@ class RegexCompileError(RegularExpressionException):
     pass
 
 class SubsetConstructionError(RegularExpressionException):
-    pass
\ No newline at end of file
+    pass
+
+class SnapshotFormatError(RegularExpressionException):
+    pass
+
+class ReadOnlyGraphError(RegularExpressionException):
+    pass
+
+class EpsilonEliminationError(RegularExpressionException):
+    pass
@@ -0,0 +1,104 @@
+"""
+MIT License
+
+Copyright (c) 2023 Csome陈绍民
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+
+
+
+
+from __future__ import annotations
+
+from collections import deque
+from typing import Dict, FrozenSet
+
+from .Graph import GraphOperator, Graph, GraphBuilder, NODE_TAG
+from .CharClass import CharClass, Alphabet
+from .BaseOperator import MergeEdgeAllowSet, ReorganizeGraphEdge
+from .Error import RegularExpressionException
+from .Interpreter import RegexInterpret, ExpressionPool, PositionBuilder
+
+
+class Exp2DFA(GraphOperator):
+    """
+    正则表达式直接转DFA图，使用 nullable / firstpos / lastpos / followpos 构造
+    不生成带空边的 NFA，也不需要 ReorganizeGraphEdge 和 SubsetConstruction，
+    输出的图与 SubsetConstruction 的结果格式相同：状态 0 为开始状态，边已按等价类整理
+    得到的 DFA 不一定是最简的，需要时再接 Brzozowski
+
+    用法如下
+    ```python
+    >>> from Lexical.RegularExpression.Exp2DFA import Exp2DFA
+    >>> g = Exp2DFA('a+').operate()
+    >>> print(g)
+    0 (1) : {}
+    1 (2) : {}
+    0->1 (a) : {}
+    1->1 (a) : {}
+    ```
+    """
+
+    def __init__(self, exp="", *, pool: ExpressionPool | None = None, simplify: bool = False):
+        self.exp = exp
+        self.pool = pool
+        self.simplify = simplify
+        if self.exp == "" or not self.exp:
+            raise RegularExpressionException("正则表达式不能为空")
+        super().__init__()
+
+    def operate(self, g: Graph | None = None) -> Graph:
+        p = PositionBuilder()
+        expr = RegexInterpret(self.exp, self.pool, self.simplify).expr
+        # 在末尾连接一个不接受任何字符的结束位置，包含它的状态就是终止状态
+        _, first, _ = p.link(expr.positions(p), p.position(CharClass()))
+        end = len(p.classes) - 1
+
+        alphabet = Alphabet(p.classes)
+        indices = [alphabet.indices(c) for c in p.classes]
+
+        mp: Dict[FrozenSet[int], int] = {first: 0}  # 位置集合 -> 新的状态编号
+        qu = deque([first])
+        dtran = []
+        while qu:
+            T = qu.popleft()
+            moves: Dict[int, set] = {}  # 等价类下标 -> 经过该类字符可以到达的位置
+            for i in T:
+                for c in indices[i]:
+                    moves.setdefault(c, set()).update(p.follow[i])
+            for c in sorted(moves):
+                U = frozenset(moves[c])
+                if U not in mp:
+                    mp[U] = len(mp)
+                    qu.append(U)
+                dtran.append((mp[T], mp[U], alphabet.classes[c]))
+
+        builder = GraphBuilder()
+        for T, name in mp.items():
+            tag = NODE_TAG.START if name == 0 else NODE_TAG.NORMAL
+            if end in T:
+                tag |= NODE_TAG.END
+            builder.addNode(None, tag, {}, name)
+        for fr, to, allow in dtran:
+            builder.addEdge(fr, to, allow)
+
+        new_g = MergeEdgeAllowSet(inplace=True).operate(builder.build())
+        new_g = ReorganizeGraphEdge(inplace=True).operate(new_g)
+        return new_g
@@ -27,43 +27,40 @@ from __future__ import annotations
 
 from .Graph import GraphOperator, Graph, NODE_TAG
 from .Error import RegularExpressionException
-from .Interpreter import RegexInterpret
+from .Interpreter import RegexInterpret, ExpressionPool
 
 
 class Exp2NFA(GraphOperator):
     """
     正则表达式转NFA图
     输入正则表达式和对应的tag，生成NFA图返回
+    多个正则表达式传入同一个 pool 时共享相同的子表达式及其 NFA 片段
+    simplify 为 True 时先对表达式进行代数化简，见 Expression.simplify
 
     用法如下
     ```python
     >>> from Lexical.RegularExpression.Exp2NFA import Exp2NFA
-    >>> g = Exp2NFA('a+', 'TEST').operate()
+    >>> g = Exp2NFA('a+').operate()
     >>> print(g)
-    1cd98558b3 (2) : {}
-    7dabfe5f1a (2) : {}
-    242a2d24e4 (2) : {}
-    e0e29d5054 (2) : {}
-    st (0) : {}
-    mid (2) : {}
-    ed (1) : {'raw': 'TEST'}
-    1cd98558b3->7dabfe5f1a : {'allow': {'a'}}
-    242a2d24e4->e0e29d5054 : {'allow': {'a'}}
-    st->1cd98558b3 : {'allow': None}
-    7dabfe5f1a->mid : {'allow': None}
-    mid->242a2d24e4 : {'allow': None}
-    e0e29d5054->ed : {'allow': None}
-    e0e29d5054->242a2d24e4 : {'allow': None}
-    mid->ed : {'allow': None}
+    0 (0) : {}
+    1 (0) : {}
+    st (1) : {}
+    ed (2) : {}
+    0->1 (a) : {}
+    st->0 (None) : {}
+    1->0 (None) : {}
+    1->ed (None) : {}
     ```
     """
 
-    def __init__(self, exp=""):
+    def __init__(self, exp="", *, pool: ExpressionPool | None = None, simplify: bool = False):
         self.exp = exp
+        self.pool = pool
+        self.simplify = simplify
         if self.exp == "" or not self.exp:
             raise RegularExpressionException("正则表达式不能为空")
         super().__init__()
 
     def operate(self, g: Graph | None = None) -> Graph:
-        g = RegexInterpret(self.exp).operate(None)
+        g = RegexInterpret(self.exp, self.pool, self.simplify).operate(None)
         return g
@@ -25,11 +25,14 @@ SOFTWARE.
 
 from __future__ import annotations
 
+import copy
+import functools
 import json
-from typing import List, Dict, Set, Any
-from tinydb import TinyDB, Query
-from tinydb.storages import MemoryStorage
+import sys
+from typing import List, Dict, Set, Any, Iterator, TextIO, NamedTuple
 from .Function import Set2Expr
+from .CharClass import CharClass, Alphabet
+from .Storage import GraphStorage, NativeStorage
 
 # import uuid
 
@@ -45,33 +48,108 @@ class NODE_TAG:
     NORMAL = 0  # 当前节点是Normal类型
 
 
+class FrozenDict(dict):
+    """
+    不可变、可哈希的 dict，用于保存节点和边上的 data
+    仍然是 dict 的子类，可以直接参与 json 序列化
+    """
+
+    __slots__ = ('_hash',)
+
+    def _immutable(self, *args, **kwargs):
+        raise TypeError("FrozenDict 是不可变对象")
+
+    __setitem__ = __delitem__ = __ior__ = _immutable
+    clear = pop = popitem = setdefault = update = _immutable
+
+    def __hash__(self):
+        try:
+            return self._hash
+        except AttributeError:
+            h = hash(frozenset((k, self._hash_value(v)) for k, v in self.items()))
+            object.__setattr__(self, '_hash', h)
+            return h
+
+    @staticmethod
+    def _hash_value(value):
+        # list 等不可哈希的值不参与哈希，只按键区分，相等判断仍然比较完整的值
+        try:
+            return hash(value)
+        except TypeError:
+            return None
+
+    def __reduce__(self):
+        return FrozenDict, (dict(self),)
+
+    def __copy__(self):
+        return self
+
+    def __deepcopy__(self, memo):
+        return FrozenDict(copy.deepcopy(dict(self), memo))
+
+    def __repr__(self):
+        return dict.__repr__(self)
+
+
+def freeze(data) -> FrozenDict:
+    if isinstance(data, FrozenDict):
+        return data
+    return FrozenDict(data or ())
+
+
 class Node:
     """
-    图Node节点抽象类
+    图Node节点抽象类，不可变且可哈希
+    id 为图内的整数状态编号，label 为可选的显示名称
+    需要修改时使用 replace() 生成新节点，再通过 Graph.updateNode 写回
     """
 
-    def __init__(self, name, tag, data=None):
-        if data is None:
-            data = {}
-        self._name = name
-        self._data = data
-        self._tag = tag
+    __slots__ = ('label', 'tag', 'data', 'id', '_hash')
 
-    @property
-    def data(self) -> dict:
-        return self._data
+    def __init__(self, name, tag, data=None, id=None):
+        object.__setattr__(self, 'label', name)
+        object.__setattr__(self, 'tag', tag)
+        object.__setattr__(self, 'data', freeze(data))
+        object.__setattr__(self, 'id', id)
+        object.__setattr__(self, '_hash', None)
 
-    @property
-    def name(self) -> str:
-        return self._name
+    def __setattr__(self, key, value):
+        raise AttributeError("Node 是不可变对象，请使用 replace()")
+
+    def __reduce__(self):
+        return Node, (self.label, self.tag, dict(self.data), self.id)
+
+    def __copy__(self):
+        return self
+
+    def __deepcopy__(self, memo):
+        return Node(self.label, self.tag, copy.deepcopy(dict(self.data), memo), self.id)
 
     @property
-    def tag(self):
-        return self._tag
+    def name(self):
+        """
+        节点句柄，有显示名称时返回名称，否则返回状态编号
+        """
+        return self.id if self.label is None else self.label
+
+    def replace(self, **kwargs) -> Node:
+        """
+        生成修改了部分字段的新节点
+        >>> Node('a', NODE_TAG.NORMAL).replace(tag=NODE_TAG.END)
+        Node('a', 2, {})
+        """
+        return Node(kwargs.get('name', self.label), kwargs.get('tag', self.tag),
+                    kwargs.get('data', self.data), kwargs.get('id', self.id))
+
+    def __eq__(self, other):
+        if not isinstance(other, Node):
+            return NotImplemented
+        return self.id == other.id and self.label == other.label and self.tag == other.tag and self.data == other.data
 
-    @tag.setter
-    def tag(self, value):
-        self._tag = value
+    def __hash__(self):
+        if self._hash is None:
+            object.__setattr__(self, '_hash', hash((self.id, self.label, self.tag, self.data)))
+        return self._hash
 
     def __repr__(self):
         return "Node(%r, %r, %r)" % (self.name, self.tag, self.data)
@@ -79,35 +157,41 @@ class Node:
 
 class Edge:
     """
-    边节点抽象类
+    边节点抽象类，不可变且可哈希，可以直接用于 set / dict 去重和分组
+    从图中取出的边 fr/to 为节点编号，用户构造时也可以使用节点名称
     """
+
+    __slots__ = ('fr', 'to', 'allow', 'data', '_hash')
+
     def __init__(self, fr, to, allow, data=None):
-        if data is None:
-            data = {}
-        self._fr = fr
-        self._to = to
-        self._allow = allow
-        self._data = data
+        object.__setattr__(self, 'fr', fr.name if isinstance(fr, Node) else fr)
+        object.__setattr__(self, 'to', to.name if isinstance(to, Node) else to)
+        if allow is not None and not isinstance(allow, CharClass):
+            allow = CharClass(allow)
+        object.__setattr__(self, 'allow', allow)
+        object.__setattr__(self, 'data', freeze(data))
+        object.__setattr__(self, '_hash', None)
 
-    @property
-    def allow(self) -> set:
-        return self._allow
+    def __setattr__(self, key, value):
+        raise AttributeError("Edge 是不可变对象")
 
-    @property
-    def fr(self) -> str:
-        if isinstance(self._fr, Node):
-            return self._fr.name
-        return self._fr
+    def __reduce__(self):
+        return Edge, (self.fr, self.to, self.allow, dict(self.data))
 
-    @property
-    def to(self) -> str:
-        if isinstance(self._to, Node):
-            return self._to.name
-        return self._to
+    def __copy__(self):
+        return self
 
-    @property
-    def data(self) -> Dict:
-        return self._data
+    def __deepcopy__(self, memo):
+        return Edge(self.fr, self.to, self.allow, copy.deepcopy(dict(self.data), memo))
+
+    def replace(self, **kwargs) -> Edge:
+        """
+        生成修改了部分字段的新边
+        >>> Edge(0, 1, {'a'}).replace(fr=1, to=0)
+        Edge(1, 0, CharClass('a'), {})
+        """
+        return Edge(kwargs.get('fr', self.fr), kwargs.get('to', self.to),
+                    kwargs.get('allow', self.allow), kwargs.get('data', self.data))
 
     def __repr__(self):
         return "Edge(%r, %r, %r, %r)" % (self.fr, self.to, self.allow, self.data)
@@ -119,63 +203,142 @@ class Edge:
             return True
         return False
 
+    def __hash__(self):
+        if self._hash is None:
+            object.__setattr__(self, '_hash', hash((self.fr, self.to, self.allow, self.data)))
+        return self._hash
+
+
+class EdgeView:
+    """
+    节点出度、入度的只读视图
+    迭代时直接返回存储中的边记录，不会复制；
+    遍历过程中需要修改图时，先调用 materialize() 取得边列表，避免邻接表在迭代中被修改
+    """
+
+    __slots__ = ('_records',)
+
+    def __init__(self, records):
+        self._records = records
+
+    def __iter__(self):
+        return iter(self._records)
+
+    def __len__(self):
+        return len(self._records)
+
+    def __bool__(self):
+        return len(self._records) != 0
+
+    def __eq__(self, other):
+        if isinstance(other, (EdgeView, list, tuple)):
+            return list(self) == list(other)
+        return NotImplemented
+
+    def materialize(self) -> List[Edge]:
+        """
+        取出当前所有边组成的新列表，列表中的元素就是存储中共享的边记录本身（边是不可变的，不会复制）
+        之后修改图不会影响这个列表的长度和内容
+        :return: 边列表
+        """
+        return list(self._records)
+
+    def __repr__(self):
+        return "EdgeView(%r)" % list(self._records)
+
 
 class Graph:
-    """ 采用点边法存储图 """
+    """
+    采用点边法存储图
+    节点使用稠密的整数状态编号，显示名称只保存在名称表中，用于展示和 to_json
+    所有接受节点的参数既可以是状态编号，也可以是显示名称
+    默认使用 NativeStorage（编号哈希索引 + 正反向邻接表），
+    也可以传入 storage=TinyDBStorage() 使用 TinyDB 后端
+    """
 
-    def __init__(self, nodes=None, edges=None):
-        self.edges = TinyDB(storage=MemoryStorage)
+    def __init__(self, nodes=None, edges=None, storage: GraphStorage | None = None):
+        if storage is None:
+            storage = NativeStorage()
+        self.storage = storage
+        if nodes or edges:
+            GraphBuilder().addNodes(nodes or []).addEdges(edges or []).load(self)
+
+    @property
+    def nodes(self):
         """
-            fr: string
-            to: string
-            allow: set
-            data: dict
+        节点表，支持 all() 与 len()
         """
-        self.nodes = TinyDB(storage=MemoryStorage)
+        return self.storage.nodes
+
+    @property
+    def edges(self):
         """
-            name: string
-            data: dict
+        边表，支持 all() 与 len()
         """
-        if nodes is None:
-            nodes: List[Node] = []
-        if edges is None:
-            edges: List[Edge] = []
-        for n in nodes:
-            self.node(n.name, n.tag, n.data)
-        for e in edges:
-            self.edge(e.fr, e.to, e.allow, e.data)
+        return self.storage.edges
+
+    def close(self):
+        """
+        释放存储后端持有的资源，例如 loadSnapshot 打开的文件和内存映射
+        """
+        self.storage.close()
+
+    def __enter__(self) -> Graph:
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    @property
+    def next_id(self) -> int:
+        """
+        下一个可分配的状态编号，合并图时用作编号偏移量
+        """
+        return self.storage.id_bound()
 
-    def node(self, name: str, tag: int, data=None):
+    def resolve(self, name) -> int:
+        """
+        将节点句柄（状态编号或显示名称）转换为状态编号
+        :param name: 状态编号或显示名称
+        :return: 状态编号
+        """
+        if isinstance(name, int):
+            return name
+        nid = self.storage.lookup(name)
+        assert nid is not None, f"不存在此名字节点 {name}"
+        return nid
+
+    def node(self, name, tag: int, data=None, id: int | None = None) -> int:
         """
         通过节点名字、tag、data创建节点
-        :param name: 节点唯一名称
+        :param name: 节点唯一显示名称，为 None 时创建匿名节点
         :param tag: 节点tag
         :param data: 节点需要保存的data
-        :return: None
+        :param id: 指定状态编号，默认分配下一个编号
+        :return: 状态编号
         >>>  g = Graph()
         >>> g.node("a", 1)
+        0
         >>> g.node("b", 2)
-        >>> g.node("c", 3)
+        1
+        >>> g.node(None, 3)
+        2
         >>> g.nodes.all()
-        [{'name': 'a', 'tag': 1, 'data': {}}
-         {'name': 'b', 'tag': 2, 'data': {}}
-         {'name': 'c', 'tag': 3, 'data': {}}]
+        [Node('a', 1, {}), Node('b', 2, {}), Node(2, 3, {})]
         """
-        if data is None:
-            data = {}
-        assert len(self.nodes.search(Query().name == name)) == 0, "已存在此名字节点"
-        self.nodes.insert(dict(
-            name=name,
-            tag=tag,
-            data=data,
-        ))
-
-    def edge(self, fr: str, to: str, allow: set | None, data=None):
+        if id is None:
+            id = self.storage.id_bound()
+        assert not self.storage.has_node(id), f"已存在此编号节点 {id}"
+        assert name is None or self.storage.lookup(name) is None, "已存在此名字节点"
+        self.storage.insert_node(Node(name, tag, data, id))
+        return id
+
+    def edge(self, fr, to, allow: CharClass | set | None, data=None):
         """
         创建边
-        :param fr: 起始节点名称
-        :param to: 终止节点名称
-        :param allow: 允许通过的字符集合
+        :param fr: 起始节点编号或名称
+        :param to: 终止节点编号或名称
+        :param allow: 允许通过的字符集合，None 表示空边，普通集合会转换为 CharClass
         :param data: 边上需要存储的数据
         :return: None
         >>> g = Graph()
@@ -183,116 +346,417 @@ class Graph:
         >>> g.node("b")
         >>> g.node("c")
         >>> g.edge("a", "b", allow={'b'})
-        >>> g.edge("b", "c", allow={'a'})
+        >>> g.edge(1, 2, allow={'a'})
         >>> g.edges.all()
-        [{'fr': 'a', 'to': 'b', 'allow': {'b'},'data': {}}
-         {'fr': 'b', 'to': 'c', 'allow': {'a'}, 'data': {}}]
+        [Edge(0, 1, CharClass('b'), {}), Edge(1, 2, CharClass('a'), {})]
         """
-        if data is None:
-            data = {}
-        assert len(self.nodes.search(Query().name == fr)) == 1, f"不存在此名字节点 {fr}"
-        assert len(self.nodes.search(Query().name == to)) == 1, f"不存在此名字节点 {to}"
-        self.edges.insert(dict(
-            fr=fr, to=to,
-            allow=allow,
-            data=data
-        ))
+        fr, to = self.resolve(fr), self.resolve(to)
+        assert self.storage.has_node(fr), f"不存在此编号节点 {fr}"
+        assert self.storage.has_node(to), f"不存在此编号节点 {to}"
+        self.storage.insert_edge(Edge(fr, to, allow, data))
 
-    def getOutDegree(self, name: str) -> List:
+    def getOutDegree(self, name) -> EdgeView:
         """
         可以根据名称节点名称获得所有的出度
-        :param name:  要获取出度的节点名称
-        :return: 出度列表
+        返回的视图直接引用存储中的边记录
+        :param name:  要获取出度的节点编号或名称
+        :return: 出度视图
         """
-        return [Edge(**_) for _ in self.edges.search(Query().fr == name)]
+        return EdgeView(self.storage.out_edges(self.resolve(name)))
 
-    def getInDegree(self, name: str) -> List:
+    def getInDegree(self, name) -> EdgeView:
         """
         根据节点名称获得所有的入度
-        :param name: 要获取入度的节点名称
-        :return: 入度列表
+        返回的视图直接引用存储中的边记录
+        :param name: 要获取入度的节点编号或名称
+        :return: 入度视图
         """
-        return [Edge(**_) for _ in self.edges.search(Query().to == name)]
+        return EdgeView(self.storage.in_edges(self.resolve(name)))
 
     def getAllNodes(self) -> List[Node]:
         """
         获得所有节点
         :return: 所有节点
         """
-        return [Node(**_) for _ in self.nodes.all()]
+        return list(self.storage.all_nodes())
 
     def getAllEdges(self) -> List[Edge]:
         """
-        获得所有边
+        获得所有边，列表中的边直接引用存储中的边记录
         :return: 所有边
         """
-        return [Edge(**_) for _ in self.edges.all()]
+        return list(self.storage.all_edges())
 
-    def getNode(self, name: str) -> Node:
+    def getNode(self, name) -> Node:
         """
         根据名称获得节点对象
-        :param name: 要获取的节点名称
+        :param name: 要获取的节点编号或名称
         :return: 节点对象
         """
-        ans = self.nodes.get(Query().name == name)
+        ans = self.storage.get_node(self.resolve(name))
         assert ans is not None, f"不存在name为 {name} 的节点"
-        return Node(**ans)
+        return ans
 
     def queryEdges(self, **kwargs) -> List[Edge]:
         assert len(kwargs) == 1
         v: str
         k, v = next(iter(kwargs.items()))
-        return [Edge(**_) for _ in self.edges.search(Query()[k] == v)]
+        if k in ('fr', 'to'):
+            v = self.resolve(v)
+        return list(self.storage.query_edges(k, v))
 
     def queryNodes(self, **kwargs) -> List[Node]:
         assert len(kwargs) == 1
         v: str
         k, v = next(iter(kwargs.items()))
-        return [Node(**_) for _ in self.nodes.search(Query()[k] == v)]
+        return list(self.storage.query_nodes(k, v))
+
+    def queryNodesByTag(self, bit: int) -> List[Node]:
+        """
+        查询 tag 包含 bit 中任意一位的节点，例如 NODE_TAG.START 同时返回 START 与 START|END 节点
+        """
+        return list(self.storage.nodes_with_tag(bit))
+
+    def queryNodesByData(self, key: str) -> List[Node]:
+        """
+        查询 data 中含有 key 的节点，例如 'raw' 返回所有带规则标签的终止节点
+        """
+        return list(self.storage.nodes_with_data(key))
 
     def updateNode(self, node: Node):
-        assert len(self.nodes.search(Query().name == node.name)) == 1, f"此节点不存在 {node.name}"
-        self.nodes.update(dict(
-            tag=node.tag,
-            data=node.data,
-        ), Query().name == node.name)
+        """
+        使用新的节点对象替换图中同编号节点的 tag 与 data
+        :param node: 通常由 getNode(...).replace(...) 得到
+        """
+        if node.id is None:
+            node = node.replace(id=self.resolve(node.name))
+        assert self.storage.has_node(node.id), f"此节点不存在 {node.name}"
+        self.storage.update_node(node)
 
-    def deleteNode(self, name: str):
-        self.nodes.remove(Query().name == name)
+    def setAllTags(self, tag: int):
+        """
+        将所有节点的tag设置为同一个值
+        :param tag: 节点tag
+        """
+        self.storage.set_all_tags(tag)
+
+    def removeEdge(self, edge: Edge):
+        """
+        删除一条与 edge 相等的边
+        :param edge: 要删除的边，fr/to 可以是编号或名称
+        """
+        self.storage.remove_edge(edge.replace(fr=self.resolve(edge.fr), to=self.resolve(edge.to)))
+
+    def removeEdges(self, edges: List[Edge]):
+        """
+        批量删除边，代价与涉及的起点出度之和成正比
+        """
+        self.storage.remove_edges([e.replace(fr=self.resolve(e.fr), to=self.resolve(e.to)) for e in edges])
+
+    def reverseEdges(self):
+        """
+        原地反转图中所有的边
+        """
+        self.storage.reverse()
+
+    def renumber(self, offset: int, keep_names=True):
+        """
+        原地将所有状态编号加上 offset
+        :param offset: 编号偏移量
+        :param keep_names: 为 False 时丢弃名称表
+        """
+        self.storage.renumber(offset, keep_names)
+
+    def deleteNode(self, name):
+        """
+        删除节点以及与之相连的所有边
+        :param name: 要删除的节点编号或名称
+        """
+        self.storage.remove_node(self.resolve(name))
+
+    def displayName(self, nid: int):
+        """
+        获得节点的显示名称，匿名节点使用状态编号
+        :param nid: 状态编号
+        :return: 显示名称
+        """
+        return self.storage.get_node(nid).name
 
     def __repr__(self):
         s = "\n".join(map(lambda n: f"{n.name} ({n.tag}) : {n.data}", self.getAllNodes())) + '\n'
-        s += "\n".join(map(lambda e: f"{e.fr}->{e.to} ({Set2Expr(e.allow) if e.allow else e.allow}) : {e.data}", self.getAllEdges())) + '\n'
+        s += "\n".join(map(lambda e: f"{self.displayName(e.fr)}->{self.displayName(e.to)} ({Set2Expr(e.allow) if e.allow else e.allow}) : {e.data}", self.getAllEdges())) + '\n'
         return s
 
+    def alphabet(self) -> Alphabet:
+        """
+        所有非空边 allow 集合的最小等价类划分
+        """
+        return Alphabet(dict.fromkeys(e.allow for e in self.storage.all_edges() if e.allow))
+
+    def stats(self) -> GraphStats:
+        """
+        统计图的规模与近似内存占用
+        """
+        nodes = edges = allow_size = epsilon = 0
+        size = self.storage.sizeof()
+        allows = set()
+        for n in self.storage.all_nodes():
+            nodes += 1
+            size += sys.getsizeof(n) + sys.getsizeof(n.data)
+        for e in self.storage.all_edges():
+            edges += 1
+            size += sys.getsizeof(e) + sys.getsizeof(e.data)
+            if e.allow is None:
+                epsilon += 1
+            else:
+                allow_size += len(e.allow)
+                if id(e.allow) not in allows:
+                    allows.add(id(e.allow))
+                    size += sys.getsizeof(e.allow) + sys.getsizeof(e.allow.mask)
+        return GraphStats(nodes, edges, allow_size, epsilon, size)
+
+    def sizeof(self) -> int:
+        """
+        近似的内存占用字节数，包括节点、边、字符集合以及存储后端的索引
+        """
+        return self.stats().bytes
+
     def to_json(self) -> str:
         """
-        将节点和边数据转换为JSON字符串
+        将节点和边数据转换为JSON字符串，节点名称使用显示名称
         :return: JSON字符串
         """
-        return json.dumps({
-            "nodes": [_ for _ in self.nodes.all()],
-            "edges": [{
-                "fr": _['fr'],
-                "to": _['to'],
-                "allow": Set2Expr(_['allow']) if _['allow'] else _['allow'],
-                "data": _['data'],
-            } for _ in self.edges.all()]
-        })
+        return ''.join(self.iter_json())
+
+    def iter_json(self, chunk_size=1024) -> Iterator[str]:
+        """
+        分块生成与 to_json() 相同的JSON文本，每块最多包含 chunk_size 条记录，
+        内存占用只与块大小有关，与图的规模无关
+        :param chunk_size: 每块的记录数
+        """
+        nodes = ({
+            "name": _.name,
+            "tag": _.tag,
+            "data": _.data,
+        } for _ in self.storage.all_nodes())
+        edges = ({
+            "fr": self.displayName(_.fr),
+            "to": self.displayName(_.to),
+            "allow": Set2Expr(_.allow) if _.allow else _.allow,
+            "data": _.data,
+        } for _ in self.storage.all_edges())
+
+        def records(it):
+            chunk = []
+            sep = ''
+            for record in it:
+                chunk.append(json.dumps(record))
+                if len(chunk) == chunk_size:
+                    yield sep + ', '.join(chunk)
+                    chunk = []
+                    sep = ', '
+            if chunk:
+                yield sep + ', '.join(chunk)
+
+        yield '{"nodes": ['
+        yield from records(nodes)
+        yield '], "edges": ['
+        yield from records(edges)
+        yield ']}'
+
+    def dump_json(self, fp: TextIO, chunk_size=1024):
+        """
+        将 to_json() 的内容分块写入文件对象
+        >>> with open('g.json', 'w') as f:
+        ...     g.dump_json(f)
+        """
+        for chunk in self.iter_json(chunk_size):
+            fp.write(chunk)
+
+
+class GraphStats(NamedTuple):
+    """
+    图的规模统计
+    nodes / edges: 节点数与边数
+    allow_size: 所有边的 allow 集合大小之和
+    epsilon_edges: 空边数量
+    bytes: 近似内存占用
+    """
+    nodes: int
+    edges: int
+    allow_size: int
+    epsilon_edges: int
+    bytes: int
+
+    def __str__(self):
+        return (f"nodes {self.nodes:<6} edges {self.edges:<6} allow {self.allow_size:<8} "
+                f"epsilon {self.epsilon_edges:<6} {self.bytes / 1024:.1f}KiB")
+
+
+class GraphBuilder:
+    """
+    批量构建图
+    先通过 addNode / addEdge 追加节点和边，最后在 build() 或 load() 时使用集合一次性校验，
+    避免逐个插入时重复进行唯一性和存在性检查，总代价与图的规模成线性关系
+    >>> b = GraphBuilder()
+    >>> st = b.addNode('st', NODE_TAG.START)
+    >>> ed = b.addNode(None, NODE_TAG.END)
+    >>> b.addEdge(st, ed, {'a'})
+    >>> g = b.build()
+    """
+
+    def __init__(self):
+        self._nodes: List[Node] = []
+        self._edges: List[Edge] = []
+        self._next_id = 0
+
+    def addNode(self, name, tag: int, data=None, id: int | None = None) -> int:
+        """
+        追加一个节点，不指定 id 时按顺序分配状态编号
+        :return: 状态编号
+        """
+        if id is None:
+            id = self._next_id
+        self._next_id = max(self._next_id, id + 1)
+        self._nodes.append(Node(name, tag, data, id))
+        return id
+
+    def addNodes(self, nodes) -> GraphBuilder:
+        for n in nodes:
+            self.addNode(n.label, n.tag, n.data, n.id)
+        return self
+
+    def addEdge(self, fr, to, allow: CharClass | set | None, data=None):
+        """
+        追加一条边，fr/to 可以是状态编号或显示名称
+        """
+        self._edges.append(Edge(fr, to, allow, data))
+
+    def addEdges(self, edges) -> GraphBuilder:
+        for e in edges:
+            self.addEdge(e.fr, e.to, e.allow, e.data)
+        return self
+
+    def load(self, g: Graph) -> Graph:
+        """
+        校验并将所有节点和边写入已有的图
+        :param g: 目标图，其中已有的节点参与唯一性与存在性校验
+        :return: 目标图
+        """
+        storage = g.storage
+        ids = set()
+        names = {}
+        for n in self._nodes:
+            assert n.id not in ids and not storage.has_node(n.id), f"已存在此编号节点 {n.id}"
+            ids.add(n.id)
+            if n.label is not None:
+                assert n.label not in names and storage.lookup(n.label) is None, "已存在此名字节点"
+                names[n.label] = n.id
+
+        def resolve(name):
+            if isinstance(name, int):
+                assert name in ids or storage.has_node(name), f"不存在此编号节点 {name}"
+                return name
+            nid = names.get(name)
+            if nid is None:
+                nid = storage.lookup(name)
+            assert nid is not None, f"不存在此名字节点 {name}"
+            return nid
+
+        edges = [Edge(resolve(e.fr), resolve(e.to), e.allow, e.data) for e in self._edges]
+        for n in self._nodes:
+            storage.insert_node(n)
+        for e in edges:
+            storage.insert_edge(e)
+        self._nodes, self._edges = [], []
+        return g
+
+    def build(self, storage: GraphStorage | None = None) -> Graph:
+        """
+        校验并生成新的图
+        :param storage: 存储后端，默认为 NativeStorage
+        :return: 新的图
+        """
+        return self.load(Graph(storage=storage))
 
 
 class GraphOperator:
     """
     基本操作类，基础的 Graph 操作类
+    inplace=True 时支持的操作直接修改输入的图并返回它，
+    代价只与实际修改的部分有关，适用于输入图之后不再使用的场景
+    没有 inplace 开关却总是修改输入图的操作把 MUTATES_INPUT 设为 True
     """
 
-    def __init__(self):
-        pass
+    MUTATES_INPUT = False
+
+    def __init__(self, inplace=False):
+        self.inplace = inplace
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        if 'operate' in cls.__dict__:
+            cls.operate = StatsRecorder.wrap(cls.operate)
+
+    @property
+    def name(self) -> str:
+        return type(self).__name__
 
     def operate(self, g: Graph | None = None) -> Graph:
         pass
 
 
+class StatsRecorder:
+    """
+    在 with 语句内，每个 GraphOperator.operate 返回后记录输出图的 GraphStats
+    嵌套调用的操作（例如 Pipeline 内的各个阶段）记录更大的 depth
+    没有启用时 operate 只多一次列表判断
+    >>> with StatsRecorder() as r:
+    ...     Lex(raw)
+    >>> print(r.report())
+    """
+
+    _active: List[StatsRecorder] = []
+    _depth = 0
+
+    def __init__(self):
+        self.records: List[tuple] = []  # (操作名, depth, GraphStats)
+
+    def __enter__(self) -> StatsRecorder:
+        StatsRecorder._active.append(self)
+        return self
+
+    def __exit__(self, *args):
+        StatsRecorder._active.remove(self)
+
+    @staticmethod
+    def wrap(operate):
+        @functools.wraps(operate)
+        def recorded(self, g=None):
+            if not StatsRecorder._active:
+                return operate(self, g)
+            StatsRecorder._depth += 1
+            try:
+                ans = operate(self, g)
+            finally:
+                StatsRecorder._depth -= 1
+            if isinstance(ans, Graph):
+                stats = ans.stats()
+                for r in StatsRecorder._active:
+                    r.records.append((self.name, StatsRecorder._depth, stats))
+            return ans
+        return recorded
+
+    def peak(self) -> tuple:
+        """
+        近似内存占用最大的一条记录
+        """
+        return max(self.records, key=lambda r: r[2].bytes)
+
+    def report(self) -> str:
+        return '\n'.join(f"{'  ' * depth}{name:<{40 - 2 * depth}} {stats}" for name, depth, stats in self.records)
+
+
 class GraphCompute:
     """
     基本操作类，基本的 Graph 计算类
@@ -306,7 +770,7 @@ class GraphCompute:
 
 
 if __name__ == '__main__':
-    a = Node('111', dict(tag=11))
+    a = Node('111', NODE_TAG.NORMAL, dict(tag=11))
     print(a.data)
-    a.data.update(tag=22)
+    a = a.replace(data=dict(a.data, tag=22))
     print(a.data)
@@ -25,46 +25,189 @@ SOFTWARE.
 
 from __future__ import annotations
 
-from typing import Tuple, List
+import re
+from typing import Dict, FrozenSet, List, Set, Tuple
 
 from .Error import RegexCompileError
 # language: python3
 # 中文注释
 
-from .Graph import GraphOperator, Graph, Node, Edge, NODE_TAG
+from .Graph import GraphOperator, Graph, GraphBuilder, Node, Edge, NODE_TAG
+from .CharClass import CharClass
 from abc import ABC, abstractmethod
-from .BaseOperator import CopyGraph, MergeGraph, MakeSameTag
-import random
 
-LETTER = '0123456789abcdefghijklmnopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXYZ'
+REPEAT_PATTERN = re.compile(r'\{[0-9]+(,[0-9]*)?\}')
 
 
-def getRandomString(k=4):
-    return ''.join(random.choices(LETTER, k=k))
+class NFABuilder:
+    """
+    Thompson 构造使用的状态分配器
+    所有子表达式共享同一个 GraphBuilder，片段之间只通过 (开始状态, 结束状态) 连接，
+    不再复制和合并子图，构造代价与正则表达式的长度成线性关系
+    指定 pool 时，相同的子表达式只构造一次，之后按编号偏移复用已记录的片段
+    """
+
+    def __init__(self, pool: ExpressionPool | None = None):
+        self.builder = GraphBuilder()
+        self.pool = pool
+        self.size = 0
+        self.edges: List[Tuple[int, int, CharClass | None]] = []
+
+    def state(self) -> int:
+        """
+        分配一个新的状态编号
+        """
+        self.size += 1
+        return self.size - 1
+
+    def edge(self, fr: int, to: int, allow: CharClass | None = None):
+        self.edges.append((fr, to, allow))
+
+    def fragment(self, expr: Expression) -> Tuple[int, int]:
+        """
+        构造子表达式的 NFA 片段，子表达式应通过该方法构造以便复用
+        :return: (开始状态, 结束状态)
+        """
+        if self.pool is None:
+            return expr.build(self)
+        return self.pool.fragment(expr, self)
+
+    def finish(self, st: int, ed: int) -> Graph:
+        """
+        标记开始、结束状态并生成 NFA 图
+        """
+        for fr, to, allow in self.edges:
+            self.builder.addEdge(fr, to, allow)
+        for nid in range(self.size):
+            if nid == st:
+                self.builder.addNode('st', NODE_TAG.START, id=nid)
+            elif nid == ed:
+                self.builder.addNode('ed', NODE_TAG.END, id=nid)
+            else:
+                self.builder.addNode(None, NODE_TAG.NORMAL, id=nid)
+        return self.builder.build()
+
+
+class ExpressionPool:
+    """
+    表达式的哈希共享池，在一次 Lex 构建中被所有正则表达式共用
+    以 (表达式类型, 子表达式, 参数) 为键，结构相同的子表达式只创建一个对象，
+    SetExpr 只解析一次，CharClass 也随之共享
+    每个表达式第一次构造 NFA 时记录片段的相对编号，之后按偏移直接复制，不再递归构造
+    >>> pool = ExpressionPool()
+    >>> pool.make(SetExpr, '0-9') is pool.make(SetExpr, '0-9')
+    True
+    """
+
+    def __init__(self):
+        self.exprs: Dict[tuple, Expression] = {}
+        self.fragments: Dict[Expression, Tuple[int, list, int, int]] = {}
+        self.simplified: Dict[Expression, Expression] = {}
+
+    def make(self, cls, *args) -> Expression:
+        """
+        创建或取出共享的表达式，args 中的子表达式必须已经来自同一个池
+        """
+        key = (cls, *args)
+        expr = self.exprs.get(key)
+        if expr is None:
+            expr = self.exprs[key] = cls(*args)
+        return expr
+
+    def fragment(self, expr: Expression, b: NFABuilder) -> Tuple[int, int]:
+        base = b.size
+        template = self.fragments.get(expr)
+        if template is None:
+            first = len(b.edges)
+            st, ed = expr.build(b)
+            edges = [(fr - base, to - base, allow) for fr, to, allow in b.edges[first:]]
+            self.fragments[expr] = (b.size - base, edges, st - base, ed - base)
+            return st, ed
+        size, edges, st, ed = template
+        b.size += size
+        b.edges.extend((fr + base, to + base, allow) for fr, to, allow in edges)
+        return st + base, ed + base
+
+    def __len__(self):
+        return len(self.exprs)
+
+
+Positions = Tuple[bool, FrozenSet[int], FrozenSet[int]]
+
+
+class PositionBuilder:
+    """
+    followpos 构造使用的位置分配器
+    每个字符或字符集合的出现对应一个位置，子表达式返回 (nullable, firstpos, lastpos)，
+    构造过程中把 followpos 记录在 follow 中，不生成任何空边
+    """
+
+    def __init__(self):
+        self.classes: List[CharClass] = []
+        self.follow: List[Set[int]] = []
 
+    def position(self, allow: CharClass) -> Positions:
+        """
+        分配一个新的位置
+        """
+        self.classes.append(allow)
+        self.follow.append(set())
+        p = frozenset([len(self.classes) - 1])
+        return False, p, p
 
-def copyGraphValid(g):
-    padding = getRandomString(5)
-    g = CopyGraph(padding).operate(g)
-    # 复制图并消除节点编号重复
-    # 判断是否为空列表否则取出第0项赋值给st
-    st_node = g.queryNodes(tag=NODE_TAG.START)[0]
-    ed_node = g.queryNodes(tag=NODE_TAG.END)[0]
-    st_node.tag = NODE_TAG.NORMAL
-    ed_node.tag = NODE_TAG.NORMAL
-    g.updateNode(st_node)
-    g.updateNode(ed_node)
-    st, ed = st_node.name, ed_node.name
-    assert st is not None and ed is not None, '图错误'
-    return st, ed, g
+    def link(self, left: Positions, right: Positions) -> Positions:
+        """
+        连接两个子表达式，left 的 lastpos 后面可以跟 right 的 firstpos
+        """
+        n1, f1, l1 = left
+        n2, f2, l2 = right
+        for i in l1:
+            self.follow[i].update(f2)
+        return n1 and n2, f1 | f2 if n1 else f1, l1 | l2 if n2 else l2
+
+    def loop(self, expr: Positions) -> Positions:
+        """
+        子表达式可以重复出现，lastpos 后面可以跟自己的 firstpos
+        """
+        for i in expr[2]:
+            self.follow[i].update(expr[1])
+        return expr
 
 
 class Expression(ABC):
 
     @abstractmethod
-    def interpret(self) -> Graph:
+    def build(self, b: NFABuilder) -> Tuple[int, int]:
+        """
+        在 b 中构造当前表达式的 NFA 片段
+        :return: (开始状态, 结束状态)
+        """
         pass
 
+    @abstractmethod
+    def positions(self, p: PositionBuilder) -> Positions:
+        """
+        在 p 中为当前表达式分配位置并记录 followpos
+        :return: (nullable, firstpos, lastpos)
+        """
+        pass
+
+    def simplify(self, pool: ExpressionPool) -> Expression:
+        """
+        代数化简，返回语言相同、构造出的自动机更小的表达式，结果在 pool 中缓存
+        """
+        ans = pool.simplified.get(self)
+        if ans is None:
+            ans = pool.simplified[self] = self._simplify(pool)
+        return ans
+
+    def _simplify(self, pool: ExpressionPool) -> Expression:
+        return self
+
+    def interpret(self, pool: ExpressionPool | None = None) -> Graph:
+        b = NFABuilder(pool)
+        return b.finish(*b.fragment(self))
+
     @abstractmethod
     def __repr__(self):
         pass
@@ -75,13 +218,16 @@ class EndExpr(Expression):
     def __init__(self, exp: str):
         assert len(exp) == 1, f"只允许一个字符: {exp}"
         self.exp = exp
+        self.allow = CharClass(exp)
         super().__init__()
 
-    def interpret(self) -> Graph:
-        return Graph(
-            nodes=[Node('st', NODE_TAG.START), Node('ed', NODE_TAG.END)],
-            edges=[Edge('st', 'ed', allow=set(self.exp))]
-        )
+    def build(self, b: NFABuilder) -> Tuple[int, int]:
+        st, ed = b.state(), b.state()
+        b.edge(st, ed, self.allow)
+        return st, ed
+
+    def positions(self, p: PositionBuilder) -> Positions:
+        return p.position(self.allow)
 
     def __repr__(self):
         return f"End('{self.exp}')"
@@ -97,11 +243,13 @@ class SetExpr(Expression):
         self.tokenPos = -1
         self.allow_set = self.statement()
 
-    def interpret(self) -> Graph:
-        return Graph(
-            nodes=[Node('st', NODE_TAG.START), Node('ed', NODE_TAG.END)],
-            edges=[Edge('st', 'ed', allow=set(self.allow_set))]
-        )
+    def build(self, b: NFABuilder) -> Tuple[int, int]:
+        st, ed = b.state(), b.state()
+        b.edge(st, ed, self.allow_set)
+        return st, ed
+
+    def positions(self, p: PositionBuilder) -> Positions:
+        return p.position(self.allow_set)
 
     def getNextToken(self) -> Tuple[str, str]:
         """
@@ -143,23 +291,20 @@ class SetExpr(Expression):
         CHAR '-' CHAR | CHAR
     """
 
-    def base_expr(self) -> set:
+    def base_expr(self) -> CharClass:
         t, c0 = self.getToken()
         assert t == 'CHAR', f'{t} {c0} is not a valid token: CHAR'
         t, c = self.getExtraToken()
         if t != 'LINK':
-            return {c0}
+            return CharClass(c0)
         t, c = self.getToken()
         assert t == 'LINK', f'{t}'
         t, c1 = self.getToken()
         assert t == 'CHAR', f'{t} {c1} is not a valid token: CHAR'
-        ans = set()
-        for c in range(ord(c0), ord(c1) + 1):
-            ans.add(chr(c))
-        return ans
+        return CharClass.from_range(c0, c1)
 
-    def statement(self):
-        ans = set()
+    def statement(self) -> CharClass:
+        ans = CharClass()
         while self.tokenPos + 1 < len(self.tokenList):
             t, c = self.getExtraToken()
             if t == 'EOF':
@@ -168,7 +313,7 @@ class SetExpr(Expression):
             ans = ans | self.base_expr()
         return ans
 
-    def getAllowSet(self):
+    def getAllowSet(self) -> CharClass:
         return self.allow_set
 
     def __repr__(self):
@@ -187,17 +332,22 @@ class ClosureExpr(Expression):
     def __init__(self, expr: Expression):
         self.expr = expr
 
-    def interpret(self) -> Graph:
-        g: Graph = self.expr.interpret()
-        st, ed, g = copyGraphValid(g)
-        g.node('st', NODE_TAG.START)
-        g.node('ed', NODE_TAG.END)
+    def build(self, b: NFABuilder) -> Tuple[int, int]:
+        gst, ged = b.fragment(self.expr)
+        st, ed = b.state(), b.state()
+
+        b.edge(ged, gst)  # G(exp).ed->G(exp).st
+        b.edge(st, gst)  # st->G(exp)
+        b.edge(ged, ed)  # G(exp)->ed
+        b.edge(st, ed)  # st->ed
+        return st, ed
+
+    def positions(self, p: PositionBuilder) -> Positions:
+        _, first, last = p.loop(self.expr.positions(p))
+        return True, first, last
 
-        g.edge(ed, st, allow=None)  # G(exp).ed->G(exp).st
-        g.edge('st', st, allow=None)  # st->G(exp)
-        g.edge(ed, 'ed', allow=None)  # G(exp)->ed
-        g.edge('st', 'ed', allow=None)  # G(exp)->ed
-        return g
+    def _simplify(self, pool: ExpressionPool) -> Expression:
+        return closure(self.expr.simplify(pool), pool)
 
     def __repr__(self):
         return f"Closure({self.expr})"
@@ -214,15 +364,20 @@ class OptionExpr(Expression):
     def __init__(self, expr: Expression):
         self.expr = expr
 
-    def interpret(self) -> Graph:
-        g = self.expr.interpret()
-        st, ed, g = copyGraphValid(g)
-        g.node('st', NODE_TAG.START)
-        g.node('ed', NODE_TAG.END)
-        g.edge('st', 'ed', allow=None)  # st -> ed
-        g.edge('st', st, allow=None)  # st -> G(expr)
-        g.edge(ed, 'ed', allow=None)  # ed -> G(expr)
-        return g
+    def build(self, b: NFABuilder) -> Tuple[int, int]:
+        gst, ged = b.fragment(self.expr)
+        st, ed = b.state(), b.state()
+        b.edge(st, ed)  # st -> ed
+        b.edge(st, gst)  # st -> G(expr)
+        b.edge(ged, ed)  # G(expr) -> ed
+        return st, ed
+
+    def positions(self, p: PositionBuilder) -> Positions:
+        _, first, last = self.expr.positions(p)
+        return True, first, last
+
+    def _simplify(self, pool: ExpressionPool) -> Expression:
+        return option(self.expr.simplify(pool), pool)
 
     def __repr__(self):
         return f"Option({self.expr})"
@@ -232,30 +387,24 @@ class LinkExpr(Expression):
     """
     正则表达式链接操作
     expr1expr2 :
-        st->G(expr1)->G(expr2)->ed
+        G(expr1).ed->G(expr2).st
     """
 
     def __init__(self, left_expr: Expression, right_expr: Expression):
         self.left = left_expr
         self.right = right_expr
 
-    def interpret(self) -> Graph:
-        gl = self.left.interpret()
-        gr = self.right.interpret()
-        lst, led, gl = copyGraphValid(gl)
-        rst, red, gr = copyGraphValid(gr)
-        g = MergeGraph(gl).operate(gr)
-
-        g = MakeSameTag(NODE_TAG.NORMAL).operate(g)
-
-        g.node('st', NODE_TAG.START)
-        g.node('ed', NODE_TAG.END)
+    def build(self, b: NFABuilder) -> Tuple[int, int]:
+        lst, led = b.fragment(self.left)
+        rst, red = b.fragment(self.right)
+        b.edge(led, rst)  # G(expr1)->G(expr2)
+        return lst, red
 
-        g.edge('st', lst, allow=None)  # st->G(expr1)
-        g.edge(led, rst, allow=None)   # G(expr1)->G(expr2)
-        g.edge(red, 'ed', allow=None)  # G(expr2)->ed
+    def positions(self, p: PositionBuilder) -> Positions:
+        return p.link(self.left.positions(p), self.right.positions(p))
 
-        return g
+    def _simplify(self, pool: ExpressionPool) -> Expression:
+        return link(self.left.simplify(pool), self.right.simplify(pool), pool)
 
     def __repr__(self):
         return f"Link({self.left}, {self.right})"
@@ -273,24 +422,24 @@ class OrExpr(Expression):
         self.left = left_expr
         self.right = right_expr
 
-    def interpret(self) -> Graph:
-        gl = self.left.interpret()
-        gr = self.right.interpret()
-        lst, led, gl = copyGraphValid(gl)
-        rst, red, gr = copyGraphValid(gr)
-        g = MergeGraph(gl).operate(gr)
+    def build(self, b: NFABuilder) -> Tuple[int, int]:
+        lst, led = b.fragment(self.left)
+        rst, red = b.fragment(self.right)
+        st, ed = b.state(), b.state()
 
-        g = MakeSameTag(NODE_TAG.NORMAL).operate(g)
+        b.edge(st, lst)  # st->G(expr1)
+        b.edge(led, ed)  # G(expr1)->ed
+        b.edge(st, rst)  # st->G(expr2)
+        b.edge(red, ed)  # G(expr2)->ed
+        return st, ed
 
-        g.node('st', NODE_TAG.START)
-        g.node('ed', NODE_TAG.END)
+    def positions(self, p: PositionBuilder) -> Positions:
+        n1, f1, l1 = self.left.positions(p)
+        n2, f2, l2 = self.right.positions(p)
+        return n1 or n2, f1 | f2, l1 | l2
 
-        g.edge('st', lst, allow=None)  # st->G(expr1)
-        g.edge(led, 'ed', allow=None)  # G(expr1)->ed
-        g.edge('st', rst, allow=None)  # st->G(expr2)
-        g.edge(red, 'ed', allow=None)  # G(expr2)->ed
-
-        return g
+    def _simplify(self, pool: ExpressionPool) -> Expression:
+        return alternation(alternatives(self.left.simplify(pool)) + alternatives(self.right.simplify(pool)), pool)
 
     def __repr__(self):
         return f"Or({self.left}, {self.right})"
@@ -298,39 +447,221 @@ class OrExpr(Expression):
 
 class PositiveClosureExpr(Expression):
     """
-    正闭包正则表达式
+    正闭包正则表达式，只构造一份子表达式，通过回边实现重复
     expr+ :
-        st->G1(expr)->mid->G2(expr)->ed
-        G2(expr).ed->G2(expr).st
-        mid->ed
+        st->G(expr)->ed
+        G(expr).ed->G(expr).st
     """
 
     def __init__(self, expr: Expression):
         self.expr = expr
 
-    def interpret(self) -> Graph:
-        g: Graph = self.expr.interpret()
-        st1, ed1, g1 = copyGraphValid(g)
-        st2, ed2, g2 = copyGraphValid(g)
+    def build(self, b: NFABuilder) -> Tuple[int, int]:
+        gst, ged = b.fragment(self.expr)
+        st, ed = b.state(), b.state()
 
-        g = MergeGraph(g1).operate(g2)
+        b.edge(st, gst)  # st->G(expr)
+        b.edge(ged, gst)  # G(expr).ed->G(expr).st
+        b.edge(ged, ed)  # G(expr)->ed
+        return st, ed
 
-        g.node('st', NODE_TAG.START)
-        g.node('mid', NODE_TAG.NORMAL)
-        g.node('ed', NODE_TAG.END)
+    def positions(self, p: PositionBuilder) -> Positions:
+        return p.loop(self.expr.positions(p))
 
-        g.edge('st', st1, allow=None)       # st->G1(expr)
-        g.edge(ed1, 'mid', allow=None)      # G1(expr)->mid
-        g.edge('mid', st2, allow=None)      # mid->G2(expr)
-        g.edge(ed2, 'ed', allow=None)       # G2(expr)->ed
+    def _simplify(self, pool: ExpressionPool) -> Expression:
+        return positive(self.expr.simplify(pool), pool)
+
+    def __repr__(self):
+        return f"Positive({self.expr})"
 
-        g.edge(ed2, st2, allow=None)        # G2(expr).ed->G2(expr).st
-        g.edge('mid', 'ed', allow=None)     # mid->ed
 
-        return g
+class RepeatExpr(Expression):
+    """
+    有界重复 expr{m} / expr{m,} / expr{m,n}，upper 为 None 表示没有上界
+    必须出现的 m 份依次链接；没有上界时再接一份带回边的 G(expr)，
+    否则再接 n-m 份可选的 G(expr)，每一份的入口都有一条直达 ed 的空边
+    状态数与 max(m, n) 乘以子表达式的大小成正比，不会出现嵌套可选带来的额外状态
+    expr{1,3} :
+        st->G1(expr)->G2(expr)->G3(expr)->ed
+        G1(expr).ed->ed
+        G2(expr).ed->ed
+    """
+
+    def __init__(self, expr: Expression, lower: int, upper: int | None):
+        assert upper is None or lower <= upper, f"重复次数的下界大于上界: {{{lower},{upper}}}"
+        self.expr = expr
+        self.lower = lower
+        self.upper = upper
+
+    def build(self, b: NFABuilder) -> Tuple[int, int]:
+        st = cur = b.state()
+        for _ in range(self.lower):
+            gst, ged = b.fragment(self.expr)
+            b.edge(cur, gst)
+            cur = ged
+        ed = b.state()
+        if self.upper is None:
+            gst, ged = b.fragment(self.expr)
+            b.edge(cur, gst)
+            b.edge(ged, gst)  # G(expr).ed->G(expr).st
+            b.edge(ged, ed)
+        else:
+            for _ in range(self.upper - self.lower):
+                b.edge(cur, ed)  # 在此处结束
+                gst, ged = b.fragment(self.expr)
+                b.edge(cur, gst)
+                cur = ged
+        b.edge(cur, ed)
+        return st, ed
+
+    def positions(self, p: PositionBuilder) -> Positions:
+        if self.upper is None:
+            _, first, last = p.loop(self.expr.positions(p))
+            ans = True, first, last
+        else:
+            # 从内向外构造 expr(expr(expr)?)?，followpos 只连接相邻的两份
+            ans = True, frozenset(), frozenset()
+            for _ in range(self.upper - self.lower):
+                _, first, last = p.link(self.expr.positions(p), ans)
+                ans = True, first, last
+        for _ in range(self.lower):
+            ans = p.link(self.expr.positions(p), ans)
+        return ans
+
+    def _simplify(self, pool: ExpressionPool) -> Expression:
+        expr = self.expr.simplify(pool)
+        if (self.lower, self.upper) == (0, None):
+            return closure(expr, pool)
+        if (self.lower, self.upper) == (1, None):
+            return positive(expr, pool)
+        if (self.lower, self.upper) == (0, 1):
+            return option(expr, pool)
+        if (self.lower, self.upper) == (1, 1):
+            return expr
+        return pool.make(RepeatExpr, expr, self.lower, self.upper)
 
     def __repr__(self):
-        return f"Positive({self.expr})"
+        upper = '' if self.upper is None else self.upper
+        if self.upper == self.lower:
+            return f"Repeat({self.expr}, {{{self.lower}}})"
+        return f"Repeat({self.expr}, {{{self.lower},{upper}}})"
+
+
+# 化简使用的构造函数，参数都是已经化简过的表达式
+
+def nullable(expr: Expression) -> bool:
+    """
+    表达式能否匹配空串
+    """
+    if isinstance(expr, (ClosureExpr, OptionExpr)):
+        return True
+    if isinstance(expr, LinkExpr):
+        return nullable(expr.left) and nullable(expr.right)
+    if isinstance(expr, OrExpr):
+        return nullable(expr.left) or nullable(expr.right)
+    if isinstance(expr, PositiveClosureExpr):
+        return nullable(expr.expr)
+    if isinstance(expr, RepeatExpr):
+        return expr.lower == 0 or nullable(expr.expr)
+    return False
+
+
+def charset(allow: CharClass, pool: ExpressionPool) -> Expression:
+    """
+    由字符集合生成 End 或 Set 表达式
+    """
+    if len(allow) == 1:
+        return pool.make(EndExpr, next(iter(allow)))
+
+    def escape(c: int) -> str:
+        return '\\' + chr(c) if chr(c) in '\\-' else chr(c)
+
+    exp = ''
+    for lo, hi in allow.ranges():
+        exp += escape(lo) if lo == hi else escape(lo) + escape(hi) if lo + 1 == hi else escape(lo) + '-' + escape(hi)
+    return pool.make(SetExpr, exp)
+
+
+def closure(expr: Expression, pool: ExpressionPool) -> Expression:
+    # (x*)* (x+)* (x?)* 都等于 x*
+    while isinstance(expr, (ClosureExpr, PositiveClosureExpr, OptionExpr)):
+        expr = expr.expr
+    return pool.make(ClosureExpr, expr)
+
+
+def option(expr: Expression, pool: ExpressionPool) -> Expression:
+    # x+? 等于 x*，本身能匹配空串时可选是多余的
+    if isinstance(expr, PositiveClosureExpr) and not nullable(expr.expr):
+        return closure(expr.expr, pool)
+    if nullable(expr):
+        return expr
+    return pool.make(OptionExpr, expr)
+
+
+def positive(expr: Expression, pool: ExpressionPool) -> Expression:
+    # (x+)+ 等于 x+，能匹配空串的表达式的正闭包就是闭包
+    if isinstance(expr, PositiveClosureExpr):
+        return expr
+    if nullable(expr):
+        return closure(expr, pool)
+    return pool.make(PositiveClosureExpr, expr)
+
+
+def link(left: Expression, right: Expression, pool: ExpressionPool) -> Expression:
+    # 连接统一为右结合，方便提取公共前缀
+    if isinstance(left, LinkExpr):
+        return link(left.left, link(left.right, right, pool), pool)
+    return pool.make(LinkExpr, left, right)
+
+
+def alternatives(expr: Expression) -> List[Expression]:
+    """
+    展开嵌套的或操作
+    """
+    if isinstance(expr, OrExpr):
+        return alternatives(expr.left) + alternatives(expr.right)
+    return [expr]
+
+
+def alternation(alts: List[Expression], pool: ExpressionPool) -> Expression:
+    """
+    合并若干个分支：去掉重复分支，按第一个连接项提取公共前缀，单个字符的分支合并为一个 Set，
+    可选的分支拆成分支本身和空串，最后再整体加上可选
+    a|b|c -> [abc]   ab|ac|a -> a([bc])?
+    """
+    groups: Dict[Expression, List[Expression | None]] = {}
+    empty = any(isinstance(_, OptionExpr) for _ in alts)
+    alts = [_ for expr in alts for _ in (alternatives(expr.expr) if isinstance(expr, OptionExpr) else [expr])]
+    for expr in alts:
+        head, tail = (expr.left, expr.right) if isinstance(expr, LinkExpr) else (expr, None)
+        tails = groups.setdefault(head, [])
+        # 可选的后缀拆成后缀本身和空后缀，与其它分支一起合并
+        for tail in ([tail.expr, None] if isinstance(tail, OptionExpr) else [tail]):
+            if tail not in tails:
+                tails.append(tail)
+
+    chars = CharClass()
+    ans = []
+    for head, tails in groups.items():
+        if tails == [None]:
+            if isinstance(head, EndExpr):
+                chars |= head.allow
+            elif isinstance(head, SetExpr):
+                chars |= head.allow_set
+            else:
+                ans.append(head)
+            continue
+        body = alternation([_ for tail in tails if tail is not None for _ in alternatives(tail)], pool)
+        if None in tails:
+            body = option(body, pool)
+        ans.append(link(head, body, pool))
+    if chars:
+        ans.insert(0, charset(chars, pool))
+
+    expr = ans[-1]
+    for other in reversed(ans[:-1]):
+        expr = pool.make(OrExpr, other, expr)
+    return option(expr, pool) if empty else expr
 
 
 # 正则表达式解释器，使用解释器模式设计
@@ -345,6 +676,7 @@ class RegexInterpret(GraphOperator):
         : factor '*'
         | factor '+'
         | factor '?'
+        | factor REPEAT
         | factor
     factor
         : '(' expr ')'
@@ -365,8 +697,11 @@ class RegexInterpret(GraphOperator):
     ) RP
     | OR
     ? OPT
+    {m} {m,} {m,n} REPEAT
     . CHAR
 
+    花括号中不是 m、m, 或 m,n 形式时仍作为普通字符处理
+
     Token数据结构
     (TokenType, Raw, Lineno)
     """
@@ -387,7 +722,7 @@ class RegexInterpret(GraphOperator):
         if token == 'OR':
             self.getToken()
             expr1 = self.grammar_expr()
-            return OrExpr(expr0, expr1)
+            return self.pool.make(OrExpr, expr0, expr1)
         elif token == 'EOF':
             return expr0
         elif token == 'RP':
@@ -406,7 +741,7 @@ class RegexInterpret(GraphOperator):
             return expr0
         else:
             expr1 = self.grammar_term()
-            return LinkExpr(expr0, expr1)
+            return self.pool.make(LinkExpr, expr0, expr1)
 
     def grammar_stmt(self) -> Expression:
         token, raw, lineno = self.getExtraToken()
@@ -414,19 +749,27 @@ class RegexInterpret(GraphOperator):
             self.raise_error(token, raw, lineno)
         expr0 = self.grammar_factor()
         token, raw, lineno = self.getExtraToken()
-        if token not in ('POSITIVE', 'CLOSURE', 'RP', 'EOF', 'OPT', 'OR', 'SET', 'CHAR', 'LP'):
+        if token not in ('POSITIVE', 'CLOSURE', 'RP', 'EOF', 'OPT', 'REPEAT', 'OR', 'SET', 'CHAR', 'LP'):
             self.raise_error(token, raw, lineno)
         if token == 'POSITIVE':
             self.getToken()
-            return PositiveClosureExpr(expr0)
+            return self.pool.make(PositiveClosureExpr, expr0)
+        elif token == 'REPEAT':
+            self.getToken()
+            lower, _, upper = raw[1:-1].partition(',')
+            lower = int(lower)
+            upper = lower if not _ else int(upper) if upper else None
+            if upper is not None and upper < lower:
+                self.raise_error(token, raw, lineno)
+            return self.pool.make(RepeatExpr, expr0, lower, upper)
         elif token in ('RP', 'EOF', 'OR', 'SET', 'CHAR', 'LP'):
             return expr0
         elif token == 'OPT':
             self.getToken()
-            return OptionExpr(expr0)
+            return self.pool.make(OptionExpr, expr0)
         else:
             self.getToken()
-            return ClosureExpr(expr0)
+            return self.pool.make(ClosureExpr, expr0)
 
     def grammar_factor(self) -> Expression:
         token, raw, lineno = self.getExtraToken()
@@ -440,19 +783,26 @@ class RegexInterpret(GraphOperator):
                 self.raise_error(token, raw, lineno)
             return expr0
         elif token == 'CHAR':
-            return EndExpr(raw)
+            return self.pool.make(EndExpr, raw)
         else:
-            return SetExpr(raw)
+            return self.pool.make(SetExpr, raw)
 
     def compile(self):
         self.pos = -1
         return self.grammar_expr()
 
-    def __init__(self, statement):
+    def __init__(self, statement, pool: ExpressionPool | None = None, simplify: bool = False):
+        """
+        :param pool: 共享子表达式的池，默认每个正则表达式单独使用一个
+        :param simplify: 构造 NFA 前先对表达式进行代数化简
+        """
         self.statement = statement
+        self.pool = ExpressionPool() if pool is None else pool
         self.tokens = self.parse()
         self.pos = -1
         self.expr = self.compile()
+        if simplify:
+            self.expr = self.expr.simplify(self.pool)
         super().__init__()
 
     def operate(self, g: Graph | None = None) -> Graph:
@@ -460,7 +810,7 @@ class RegexInterpret(GraphOperator):
         处理函数，根据statement编写正则表达式解释器
         :type g: 输入需要处理的图
         """
-        return self.expr.interpret()
+        return self.expr.interpret(self.pool)
 
     def parse(self) -> List:
 
@@ -491,6 +841,10 @@ class RegexInterpret(GraphOperator):
                 return 'RP', expr[pos], pos
             elif expr[pos] == '?':
                 return 'OPT', expr[pos], pos
+            elif expr[pos] == '{' and REPEAT_PATTERN.match(expr, pos):
+                raw = REPEAT_PATTERN.match(expr, pos).group()
+                pos += len(raw) - 1
+                return 'REPEAT', raw, pos
             elif expr[pos] == "\\":
                 pos += 1
                 return 'CHAR', expr[pos], pos
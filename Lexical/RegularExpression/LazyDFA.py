@@ -0,0 +1,187 @@
+"""
+MIT License
+
+Copyright (c) 2023 Csome陈绍民
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+
+
+
+
+from __future__ import annotations
+
+from typing import Dict, FrozenSet, Iterable, List, Tuple
+
+from .Graph import Graph, NODE_TAG
+from .SpecialCompute import GetStartNodes
+
+DEAD = -1  # 没有后继状态
+UNKNOWN = -2  # 转移还没有计算过
+
+
+class LazyDFA:
+    """
+    惰性DFA匹配器，直接在 Exp2NFA 生成的 NFA 上匹配，不做完整的子集构造
+    DFA 状态（NFA 状态的空闭包集合）只在匹配过程中第一次用到时才计算，并缓存在按等价类下标索引的转移表中
+    缓存最多保存 max_states 个状态，满了以后整体清空重新开始；
+    如果两次清空之间扫描的字符数少于 min_chars_per_state * max_states，说明缓存在抖动，
+    本次匹配剩下的部分改为直接模拟 NFA
+    >>> from Lexical.RegularExpression.Exp2NFA import Exp2NFA
+    >>> m = LazyDFA(Exp2NFA('(a|b)*abb').operate())
+    >>> m.fullmatch('babb')
+    True
+    >>> m.match('abbab')
+    3
+    """
+
+    def __init__(self, g: Graph, max_states: int = 1024, min_chars_per_state: int = 10):
+        assert max_states >= 2, f"缓存至少需要保存两个状态: {max_states}"
+        self.max_states = max_states
+        self.min_chars_per_state = min_chars_per_state
+        self.alphabet = g.alphabet()
+        self.eps: Dict[int, List[int]] = {}
+        self.moves: Dict[int, List[Tuple[FrozenSet[int], int]]] = {}
+        for e in g.getAllEdges():
+            if e.allow is None:
+                self.eps.setdefault(e.fr, []).append(e.to)
+            else:
+                self.moves.setdefault(e.fr, []).append((frozenset(self.alphabet.indices(e.allow)), e.to))
+        self.ends = frozenset(n.id for n in g.queryNodesByTag(NODE_TAG.END))
+        self.start = self.closure(n.id for n in GetStartNodes().compute(g))
+
+        self.hits = 0  # 命中缓存的转移次数
+        self.misses = 0  # 需要计算的转移次数
+        self.flushes = 0  # 缓存清空次数
+        self.fallbacks = 0  # 改为模拟 NFA 的次数
+        self.progress = 0  # 上次清空以来扫描的字符数
+        self.reset()
+
+    def reset(self):
+        """
+        清空缓存的所有状态
+        """
+        self.ids: Dict[FrozenSet[int], int] = {}
+        self.sets: List[FrozenSet[int]] = []
+        self.accepts: List[bool] = []
+        self.trans: List[List[int]] = []
+
+    def __len__(self):
+        return len(self.sets)
+
+    def closure(self, ns: Iterable[int]) -> FrozenSet[int]:
+        """
+        求空闭包
+        """
+        ans = set(ns)
+        stack = list(ans)
+        while stack:
+            for to in self.eps.get(stack.pop(), ()):
+                if to not in ans:
+                    ans.add(to)
+                    stack.append(to)
+        return frozenset(ans)
+
+    def step(self, s: FrozenSet[int], c: int) -> FrozenSet[int]:
+        """
+        NFA 状态集合 s 经过第 c 个等价类的字符后到达的状态集合
+        """
+        return self.closure(to for n in s for cls, to in self.moves.get(n, ()) if c in cls)
+
+    def state(self, s: FrozenSet[int]) -> int:
+        """
+        取出或创建 s 对应的缓存状态
+        """
+        sid = self.ids.get(s)
+        if sid is None:
+            sid = self.ids[s] = len(self.sets)
+            self.sets.append(s)
+            self.accepts.append(not s.isdisjoint(self.ends))
+            self.trans.append([UNKNOWN] * len(self.alphabet))
+        return sid
+
+    def _simulate(self, text: str, i: int, s: FrozenSet[int], last: int) -> int:
+        class_of = self.alphabet.class_of
+        while i < len(text):
+            c = class_of.get(ord(text[i]))
+            if c is None:
+                break
+            s = self.step(s, c)
+            if not s:
+                break
+            i += 1
+            if not s.isdisjoint(self.ends):
+                last = i
+        return last
+
+    def scan(self, text: str, pos: int = 0) -> int:
+        """
+        从 pos 开始匹配，返回最长匹配的结束位置，没有匹配时返回 -1
+        """
+        class_of = self.alphabet.class_of
+        cur = self.state(self.start)
+        last = pos if self.accepts[cur] else -1
+        i = pos
+        while i < len(text):
+            c = class_of.get(ord(text[i]))
+            if c is None:
+                break
+            nxt = self.trans[cur][c]
+            if nxt == UNKNOWN:
+                self.misses += 1
+                cur_set = self.sets[cur]
+                s = self.step(cur_set, c)
+                if not s:
+                    nxt = DEAD
+                else:
+                    if s not in self.ids and len(self.sets) >= self.max_states:
+                        thrashing = self.progress < self.min_chars_per_state * self.max_states
+                        self.flushes += 1
+                        self.progress = 0
+                        self.reset()
+                        if thrashing:
+                            self.fallbacks += 1
+                            return self._simulate(text, i, cur_set, last)
+                        cur = self.state(cur_set)
+                    nxt = self.state(s)
+                self.trans[cur][c] = nxt
+            else:
+                self.hits += 1
+            if nxt == DEAD:
+                break
+            cur = nxt
+            i += 1
+            self.progress += 1
+            if self.accepts[cur]:
+                last = i
+        return last
+
+    def match(self, text: str, pos: int = 0) -> int:
+        """
+        从 pos 开始的最长匹配长度，没有匹配时返回 -1
+        """
+        end = self.scan(text, pos)
+        return end if end < 0 else end - pos
+
+    def fullmatch(self, text: str) -> bool:
+        return self.scan(text) == len(text)
+
+    def __repr__(self):
+        return f"LazyDFA(states={len(self.sets)}, hits={self.hits}, misses={self.misses}, " \
+               f"flushes={self.flushes}, fallbacks={self.fallbacks})"
@@ -25,10 +25,10 @@ SOFTWARE.
 
 from __future__ import annotations
 
+from collections import deque
 from typing import List
 
-from .Function import getHash
-from .Graph import Graph, GraphOperator, NODE_TAG, Edge
+from .Graph import Graph, GraphOperator, GraphBuilder, NODE_TAG, Edge
 from .BaseOperator import MergeEdgeAllowSet, ReorganizeGraphEdge
 from .SpecialCompute import GetStartNodes, GetEndNodes
 from .Error import SubsetConstructionError
@@ -45,30 +45,29 @@ class NFA2DFA(GraphOperator):
         ed_node = g.queryNodes(tag=NODE_TAG.END)[0]
 
         def none_closure(n: str, already=()):
-            q = []
+            q = deque()
             ans = set(already)
             q.append(n)
             while q:
-                p = q.pop(0)
+                p = q.popleft()
                 ans.add(p)
                 for e in g.getOutDegree(p):
                     if e.allow is None and e.to not in ans:
                         q.append(e.to)
             return tuple(sorted(ans))
 
-        print(none_closure(st_node.name))
-        qu = []
-        mp = {}  # set序列化后对应新的节点名称
+        qu = deque()
+        mp = {}  # set序列化后对应新的状态编号
         all_allow_set = list(filter(lambda x: x, map(lambda e: e.allow, edges)))
-        qu.append((st_node.name,))
+        qu.append((st_node.id,))
         while qu:
-            node_set = qu.pop(0)
+            node_set = qu.popleft()
             none_closure_set = ()
             for n in node_set:
                 none_closure_set = none_closure(n, none_closure_set)
             if none_closure_set in mp:
                 continue
-            mp[none_closure_set] = getHash(''.join(none_closure_set))
+            mp[none_closure_set] = len(mp)
 
             for allow in all_allow_set:
                 next_node_set = set()
@@ -85,7 +84,7 @@ class NFA2DFA(GraphOperator):
                 else:
                     new_mp[kk] = {v}
 
-        new_g = Graph()
+        builder = GraphBuilder()
         for old_set, new_name in mp.items():
             tag = NODE_TAG.NORMAL
             data = {}
@@ -94,7 +93,7 @@ class NFA2DFA(GraphOperator):
                 tag |= nt.tag
                 assert not data.keys() & nt.data.keys(), "存在合并问题"
                 data.update(nt.data)
-            new_g.node(new_name, tag, data)
+            builder.addNode(None, tag, data, new_name)
 
         # print(new_g)
         # print(mp)
@@ -104,10 +103,10 @@ class NFA2DFA(GraphOperator):
                 continue
             for efr in new_mp[e.fr]:
                 for eto in new_mp[e.to]:
-                    new_g.edge(efr, eto, e.allow, e.data)
+                    builder.addEdge(efr, eto, e.allow, e.data)
         # print(new_g)
-        new_g = MergeEdgeAllowSet().operate(new_g)
-        new_g = ReorganizeGraphEdge().operate(new_g)
+        new_g = MergeEdgeAllowSet(inplace=True).operate(builder.build())
+        new_g = ReorganizeGraphEdge(inplace=True).operate(new_g)
 
         return new_g
 
@@ -124,59 +123,59 @@ class SubsetConstruction(GraphOperator):
 
     def operate(self, g: Graph | None = None) -> Graph:
 
-        edges = g.getAllEdges()
         st_nodes = GetStartNodes().compute(g)
-        all_allow_set = list(filter(lambda x: x, map(lambda e: ''.join(sorted(e.allow)) if e.allow else None, edges)))
+        alphabet = g.alphabet()  # 输入的边不需要预先拆分成互不相交的集合
+
+        # 已经消除空边（见 EliminateEpsilon）的图不需要求空闭包
+        epsilon_free = all(e.allow is not None for e in g.getAllEdges())
 
         def none_closure(ns=()):
             # 求空闭包的函数传入需要求的节点
-            q = []
-            ans = set()
-            q.extend(ns)
+            if epsilon_free:
+                return frozenset(ns)
+            ans = set(ns)
+            q = list(ans)
             while q:
-                p = q.pop(0)
-                ans.add(p)
-                for e in g.getOutDegree(p):
+                for e in g.getOutDegree(q.pop()):
                     if e.allow is None and e.to not in ans:
+                        ans.add(e.to)
                         q.append(e.to)
             return frozenset(ans)
 
-        qu = [none_closure([n.name for n in st_nodes])]
-        mp = {}
-        done = set()
+        qu = deque([none_closure([n.id for n in st_nodes])])
+        mp = {}  # 状态集合 -> 新的状态编号
         dtran = set()
+        mp[qu[0]] = 0
         while qu:  # 如果还存在没有标记过的
-            T = qu.pop(0)
-            t_name = getHash(''.join(sorted(T)))  # 使用哈希优化
-            mp[T] = t_name
-            done.add(t_name)
-            for allow in all_allow_set:
-                next_node_set = set()
-                for n in T:
-                    # 获得allow set相同的所有出度节点
-                    next_node_set.update(map(lambda x: x.to,
-                                             filter(lambda x: ''.join(sorted(x.allow)) == allow if x.allow else x.allow == allow,
-                                                    g.getOutDegree(n))))
-                next_node_set = frozenset(next_node_set)
-                if not next_node_set:
-                    continue
-                next_node_set = none_closure(next_node_set)
-                next_node_set_name = getHash(''.join(sorted(next_node_set)))
-                if next_node_set_name not in done:
+            T = qu.popleft()
+            t_name = mp[T]
+            moves = {}  # 等价类下标 -> 经过该类字符可以到达的节点
+            for n in T:
+                for e in g.getOutDegree(n):
+                    if e.allow is None:
+                        continue
+                    for c in alphabet.indices(e.allow):
+                        moves.setdefault(c, set()).add(e.to)
+            for c in sorted(moves):
+                allow = alphabet.classes[c]
+                next_node_set = none_closure(moves[c])
+                if next_node_set not in mp:
+                    mp[next_node_set] = len(mp)
                     qu.append(next_node_set)
-                    done.add(next_node_set_name)
+                next_node_set_name = mp[next_node_set]
                 dtran.add((
                     t_name,
                     next_node_set_name,
-                    frozenset(allow)
+                    allow
                 ))
-        new_g = Graph()
+        builder = GraphBuilder()
         for old_set, new_name in mp.items():
-            tag = NODE_TAG.NORMAL
+            # 只有初始状态集合是开始状态，其余集合即使包含原图的开始节点也不是
+            tag = NODE_TAG.START if new_name == 0 else NODE_TAG.NORMAL
             data = {}
             for n in old_set:
                 nt = g.getNode(n)
-                tag |= nt.tag
+                tag |= nt.tag & NODE_TAG.END
                 if data.keys() & nt.data.keys():
                     # 当两个节点都可以在当前位置终止的时候，存在二义性，这里采用模板方法，导入一个callback函数解决
                     if self.conflict_callback is None:
@@ -184,15 +183,15 @@ class SubsetConstruction(GraphOperator):
                     data = self.conflict_callback(data, nt.data)
                 else:
                     data.update(nt.data)
-            new_g.node(new_name, tag, data)
+            builder.addNode(None, tag, data, new_name)
 
         # print(mp)
         # print(dtran)
         for fr, to, allow in dtran:
-            new_g.edge(fr, to, set(allow))
+            builder.addEdge(fr, to, allow)
 
-        new_g = MergeEdgeAllowSet().operate(new_g)
-        new_g = ReorganizeGraphEdge().operate(new_g)
+        new_g = MergeEdgeAllowSet(inplace=True).operate(builder.build())
+        new_g = ReorganizeGraphEdge(inplace=True).operate(new_g)
 
         return new_g
 
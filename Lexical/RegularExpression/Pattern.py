@@ -0,0 +1,182 @@
+"""
+MIT License
+
+Copyright (c) 2023 Csome陈绍民
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+
+
+
+
+from __future__ import annotations
+
+from functools import lru_cache
+from typing import Iterator, List, Tuple
+
+from .Graph import Graph, NODE_TAG
+from .Exp2DFA import Exp2DFA
+from .SimplifyDFA import Brzozowski
+from .SpecialCompute import GetStartNodes
+
+DEAD = -1
+ASCII = 128
+
+
+class Match:
+    """
+    一次匹配的结果
+    """
+
+    __slots__ = ('string', 'pos', 'endpos')
+
+    def __init__(self, string: str, pos: int, endpos: int):
+        self.string = string
+        self.pos = pos
+        self.endpos = endpos
+
+    def group(self) -> str:
+        return self.string[self.pos:self.endpos]
+
+    def start(self) -> int:
+        return self.pos
+
+    def end(self) -> int:
+        return self.endpos
+
+    def span(self) -> Tuple[int, int]:
+        return self.pos, self.endpos
+
+    def __repr__(self):
+        return f"<Match span={self.span()} match={self.group()!r}>"
+
+
+class Pattern:
+    """
+    编译后的正则表达式，使用最简DFA的稠密转移表匹配
+    状态 0 为开始状态，trans[state * width + cls] 是下一个状态，DEAD 表示没有转移
+    匹配采用最左最长规则，与词法分析器一致（Python 的 re 是最左优先）
+    >>> p = compile('[0-9]+(.[0-9]+)?')
+    >>> p.search('x = 3.14;')
+    <Match span=(4, 8) match='3.14'>
+    >>> [m.group() for m in p.finditer('1 22 333')]
+    ['1', '22', '333']
+    """
+
+    def __init__(self, pattern: str, g: Graph):
+        self.pattern = pattern
+        alphabet = g.alphabet()
+        self.width = len(alphabet)
+        self.class_of = alphabet.class_of
+        self.ascii = alphabet.table(ASCII)  # ASCII 字符直接查表，不属于任何类的字符映射为 width
+
+        order = [n.id for n in GetStartNodes().compute(g)]
+        assert len(order) == 1, f"DFA 只能有一个开始状态: {pattern}"
+        order += [n.id for n in g.getAllNodes() if n.id != order[0]]
+        index = {nid: i for i, nid in enumerate(order)}
+        self.accepts: List[bool] = [bool(g.getNode(nid).tag & NODE_TAG.END) for nid in order]
+        self.trans: List[int] = [DEAD] * (len(order) * self.width)
+        for e in g.getAllEdges():
+            base = index[e.fr] * self.width
+            for c in alphabet.indices(e.allow):
+                self.trans[base + c] = index[e.to]
+        # 开始状态上有转移的字符类，search 用来跳过不可能开始匹配的位置
+        self.first = [self.trans[c] != DEAD for c in range(self.width)] + [False]
+
+    def __len__(self):
+        return len(self.accepts)
+
+    def _class(self, ch: str) -> int:
+        code = ord(ch)
+        if code < ASCII:
+            return self.ascii[code]
+        return self.class_of.get(code, self.width)
+
+    def _longest(self, string: str, pos: int, endpos: int) -> int:
+        """
+        从 pos 开始最长匹配的结束位置，没有匹配时返回 -1
+        """
+        trans, accepts, width = self.trans, self.accepts, self.width
+        state = 0
+        last = pos if accepts[0] else -1
+        for i in range(pos, endpos):
+            c = self._class(string[i])
+            if c == width:
+                break
+            state = trans[state * width + c]
+            if state == DEAD:
+                break
+            if accepts[state]:
+                last = i + 1
+        return last
+
+    def match(self, string: str, pos: int = 0, endpos: int | None = None) -> Match | None:
+        """
+        从 pos 开始匹配
+        """
+        endpos = len(string) if endpos is None else min(endpos, len(string))
+        end = self._longest(string, pos, endpos)
+        return None if end < 0 else Match(string, pos, end)
+
+    def fullmatch(self, string: str, pos: int = 0, endpos: int | None = None) -> Match | None:
+        """
+        pos 到 endpos 之间的整个字符串都要匹配
+        """
+        endpos = len(string) if endpos is None else min(endpos, len(string))
+        return Match(string, pos, endpos) if self._longest(string, pos, endpos) == endpos else None
+
+    def search(self, string: str, pos: int = 0, endpos: int | None = None) -> Match | None:
+        """
+        查找第一个可以开始匹配的位置
+        """
+        endpos = len(string) if endpos is None else min(endpos, len(string))
+        for i in range(pos, endpos + 1):
+            if not self.accepts[0] and (i == endpos or not self.first[self._class(string[i])]):
+                continue
+            end = self._longest(string, i, endpos)
+            if end >= 0:
+                return Match(string, i, end)
+        return None
+
+    def finditer(self, string: str, pos: int = 0, endpos: int | None = None) -> Iterator[Match]:
+        """
+        依次返回所有不重叠的匹配，空匹配之后向后移动一个字符
+        """
+        endpos = len(string) if endpos is None else min(endpos, len(string))
+        while pos <= endpos:
+            m = self.search(string, pos, endpos)
+            if m is None:
+                return
+            yield m
+            pos = m.endpos if m.endpos > m.pos else m.endpos + 1
+
+    def findall(self, string: str, pos: int = 0, endpos: int | None = None) -> List[str]:
+        return [m.group() for m in self.finditer(string, pos, endpos)]
+
+    def __repr__(self):
+        return f"Pattern({self.pattern!r}, states={len(self)})"
+
+
+@lru_cache(maxsize=128)
+def compile(pattern: str) -> Pattern:
+    """
+    编译正则表达式，最近使用的 128 个结果会被缓存，重复编译同一个表达式时直接返回
+    使用 compile.cache_clear() 清空缓存
+    """
+    return Pattern(pattern, Brzozowski().operate(Exp2DFA(pattern, simplify=True).operate()))
@@ -0,0 +1,195 @@
+"""
+MIT License
+
+Copyright (c) 2023 Csome陈绍民
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+
+
+
+from __future__ import annotations
+
+import time
+from typing import Callable, List, NamedTuple, Tuple
+
+from .Graph import Graph, GraphOperator, GraphBuilder, Node, Edge
+from .BaseOperator import CopyGraph
+
+
+def _mutates(stage: GraphOperator) -> bool:
+    return getattr(stage, "inplace", False) or stage.MUTATES_INPUT
+
+
+class StructuralOperator(GraphOperator):
+    """
+    可融合的结构性操作，只对每个节点、每条边做局部映射，最后可以追加新的节点和边
+    Pipeline 会把相邻的结构性操作融合成一次遍历，中间不再生成图
+    子类需要实现 fuseNode / fuseEdge，需要追加元素时实现 fuseEnd
+    """
+
+    def fuseBegin(self):
+        """
+        开始一次融合遍历，清空上一次遍历记录的状态
+        """
+        pass
+
+    def fuseNode(self, n: Node) -> Node:
+        return n
+
+    def fuseEdge(self, e: Edge) -> Edge:
+        return e
+
+    def fuseEnd(self, new_id: Callable[[], int]) -> Tuple[List[Node], List[Edge]]:
+        """
+        所有上游元素都已经经过本操作后调用，返回追加的节点和边
+        :param new_id: 分配新状态编号
+        """
+        return [], []
+
+
+class FusedStage(GraphOperator):
+    """
+    若干相邻结构性操作融合后的阶段，对输入图只遍历一次并只生成一个新图
+    """
+
+    def __init__(self, operators: List[StructuralOperator]):
+        self.operators = operators
+        super().__init__()
+
+    @property
+    def name(self) -> str:
+        return '+'.join(type(_).__name__ for _ in self.operators)
+
+    def operate(self, g: Graph | None = None) -> Graph:
+        ops = self.operators
+        for op in ops:
+            op.fuseBegin()
+        builder = GraphBuilder()
+
+        def emit(nodes, edges, start):
+            for n in nodes:
+                for op in ops[start:]:
+                    n = op.fuseNode(n)
+                builder.addNode(n.label, n.tag, n.data, n.id)
+            for e in edges:
+                for op in ops[start:]:
+                    e = op.fuseEdge(e)
+                builder.addEdge(e.fr, e.to, e.allow, e.data)
+
+        emit(g.getAllNodes(), g.getAllEdges(), 0)
+        next_id = [g.next_id]
+
+        def new_id() -> int:
+            next_id[0] += 1
+            return next_id[0] - 1
+
+        # 前面操作追加的元素还要经过后面的操作
+        for i, op in enumerate(ops):
+            emit(*op.fuseEnd(new_id), i + 1)
+        return builder.build()
+
+
+class StageRecord(NamedTuple):
+    name: str
+    seconds: float
+    nodes: int
+    edges: int
+
+    def __str__(self):
+        return f"{self.name:<40} {self.seconds * 1000:9.3f}ms nodes {self.nodes:<6} edges {self.edges}"
+
+
+class Pipeline(GraphOperator):
+    """
+    组合多个 GraphOperator，按顺序执行
+    相邻的 StructuralOperator 会被融合为一个 FusedStage，嵌套的 Pipeline 会被展开
+    每次 operate 都会在 records 中记录各阶段的耗时和输出图的规模
+    >>> p = Pipeline(MakeVirtualNode(), ReverseGraph(), ReverseTag(), SubsetConstruction())
+    >>> p
+    Pipeline(MakeVirtualNode+ReverseGraph+ReverseTag -> SubsetConstruction)
+    >>> g = p.operate(g)
+    >>> print(p.report())
+    """
+
+    def __init__(self, *operators: GraphOperator, fuse=True):
+        self.operators: List[GraphOperator] = []
+        for op in operators:
+            if isinstance(op, Pipeline):
+                self.operators.extend(op.operators)
+            else:
+                self.operators.append(op)
+        self.fuse = fuse
+        self.stages = self._plan()
+        self.records: List[StageRecord] = []
+        super().__init__()
+
+    def _plan(self) -> List[GraphOperator]:
+        stages = []
+        group = []
+        for op in self.operators + [None]:
+            if self.fuse and isinstance(op, StructuralOperator):
+                group.append(op)
+                continue
+            if len(group) == 1:
+                stages.append(group[0])
+            elif group:
+                stages.append(FusedStage(group))
+            group = []
+            if op is not None:
+                stages.append(op)
+        return stages
+
+    def then(self, *operators: GraphOperator) -> Pipeline:
+        """
+        返回在末尾追加了 operators 的新 Pipeline
+        """
+        return Pipeline(*self.operators, *operators, fuse=self.fuse)
+
+    def operate(self, g: Graph | None = None) -> Graph:
+        return self.replay(g)
+
+    def replay(self, g: Graph | None = None, stop: int | None = None) -> Graph:
+        """
+        重新执行前 stop 个阶段（默认全部），返回该阶段输出的图，用于调试中间结果
+        第一个会修改输入的阶段之前先复制 g，调用方的图不受影响，可以反复 replay
+        """
+        self.records = []
+        source = g
+        for stage in self.stages[:stop]:
+            if g is not None and g is source and _mutates(stage):
+                g = CopyGraph().operate(g)
+            begin = time.perf_counter()
+            g = stage.operate(g)
+            seconds = time.perf_counter() - begin
+            self.records.append(StageRecord(stage.name, seconds,
+                                            g.storage.node_count(), g.storage.edge_count()))
+        return g
+
+    def report(self) -> str:
+        """
+        最近一次执行的分阶段统计
+        """
+        return '\n'.join(map(str, self.records))
+
+    def __len__(self):
+        return len(self.stages)
+
+    def __repr__(self):
+        return "Pipeline(%s)" % ' -> '.join(_.name for _ in self.stages)
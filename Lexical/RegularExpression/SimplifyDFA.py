@@ -27,34 +27,31 @@ from __future__ import annotations
 
 from typing import List
 
-from .Function import getHash, dealWithConflict
+from .Function import dealWithConflict
 from .Graph import Graph, GraphOperator, NODE_TAG, Edge
 from .BaseOperator import MergeEdgeAllowSet, ReorganizeGraphEdge
-from .SpecialOperator import MakeVirtualNode, ReverseGraph, ReachableCut, ReverseTag
+from .SpecialOperator import ReverseView, ReachableCut
 from .NFA2DFA import SubsetConstruction
+from .Pipeline import Pipeline
 
-class Brzozowski(GraphOperator):
+class Brzozowski(Pipeline):
     """
     使用Brzozowski算法最小化DFA
+    反转使用 ReverseView，不复制整张图，也不会修改输入的图；
+    SubsetConstruction 直接从所有起始节点的空闭包开始，因此不再需要添加虚拟开始结束节点
+    可以通过 records / report() 查看每个阶段的耗时和图的规模
     """
 
-    def operate(self, g: Graph | None = None) -> Graph:
-        g = MakeVirtualNode().operate(g)  # 添加虚拟开始结束节点
-        g = ReverseGraph().operate(g)  # 反转所有的边
-        g = ReverseTag().operate(g)  # 反转开始结束节点tag
-        g = SubsetConstruction(dealWithConflict).operate(g)  # SC操作化简成DFA
-        g = ReachableCut().operate(g)  # 删除不可达节点
-
-        g = MakeVirtualNode().operate(g)  # 添加虚拟开始结束节点
-        g = ReverseGraph().operate(g)  # 反转所有的边
-        g = ReverseTag().operate(g)  # 反转开始结束节点tag
-        g = SubsetConstruction(dealWithConflict).operate(g)  # SC操作化简成DFA
-        g = ReachableCut().operate(g)  # 删除不可达节点
-
-        g = MergeEdgeAllowSet().operate(g)
-        g = ReorganizeGraphEdge().operate(g)
-
-        return g
-
+    def __init__(self):
+        super().__init__(
+            ReverseView(),  # 反转所有的边以及开始结束节点tag
+            SubsetConstruction(dealWithConflict),  # SC操作化简成DFA
+            ReachableCut(inplace=True),  # 删除不可达节点
 
+            ReverseView(),  # 反转所有的边以及开始结束节点tag
+            SubsetConstruction(dealWithConflict),  # SC操作化简成DFA
+            ReachableCut(inplace=True),  # 删除不可达节点
 
+            MergeEdgeAllowSet(inplace=True),
+            ReorganizeGraphEdge(inplace=True),
+        )
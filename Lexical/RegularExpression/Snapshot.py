@@ -0,0 +1,314 @@
+"""
+MIT License
+
+Copyright (c) 2023 Csome陈绍民
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+
+
+from __future__ import annotations
+
+import ast
+import mmap
+import struct
+import weakref
+from typing import Any, Dict, Iterable, List
+
+from .CharClass import CharClass
+from .Error import SnapshotFormatError, ReadOnlyGraphError
+from .Graph import Graph, GraphCompute, Node, Edge
+from .Storage import GraphStorage, _RecordTable
+
+# 二进制快照格式（小端序）
+#
+# Header      : magic(4s) version(H) class_width(H) node_count(I) edge_count(I) class_count(I)
+#               states_off(I) trans_off(I) in_off(I) classes_off(I) data_off(I)
+# State 表    : 按状态编号排序，每项 id tag meta_off meta_len out_start out_count in_start in_count
+# Transition表: 按起始状态分组，每项 fr to class data_off data_len，class 为 EPSILON 表示空边
+# In 索引     : 按终止状态分组的 Transition 下标
+# Class 表    : 每个字符类占 class_width 字节的小端位图
+# Data 表     : 节点 (label, data) 与边 data 的 Python 字面量
+
+MAGIC = b'CSGS'
+VERSION = 1
+EPSILON = 0xFFFFFFFF
+
+HEADER = struct.Struct('<4sHHIIIIIIII')
+STATE = struct.Struct('<IIIIIIII')
+TRANS = struct.Struct('<IIIII')
+INDEX = struct.Struct('<I')
+
+
+class SaveSnapshot(GraphCompute):
+    """
+    将图写入二进制快照文件，返回写入的字节数
+    >>> SaveSnapshot('lexer.gs').compute(g)
+    """
+
+    def __init__(self, filename: str):
+        self.filename = filename
+        super().__init__()
+
+    def compute(self, g: Graph) -> int:
+        nodes = sorted(g.getAllNodes(), key=lambda n: n.id)
+        classes: Dict[CharClass, int] = {}
+        data = bytearray()
+        blobs: Dict[str, tuple] = {}
+
+        def blob(value) -> tuple:
+            if not value:
+                return 0, 0
+            raw = repr(value)
+            try:
+                valid = ast.literal_eval(raw) == value
+            except (ValueError, SyntaxError, TypeError, MemoryError, RecursionError):
+                valid = False
+            if not valid:
+                raise SnapshotFormatError(f"只能保存由 Python 字面量组成的 data: {raw}")
+            if raw not in blobs:
+                encoded = raw.encode()
+                blobs[raw] = (len(data), len(encoded))
+                data.extend(encoded)
+            return blobs[raw]
+
+        trans = []
+        states = []
+        for n in nodes:
+            out = list(g.getOutDegree(n.id))
+            meta = blob((n.label, dict(n.data))) if n.label is not None or n.data else (0, 0)
+            states.append([n.id, n.tag, *meta, len(trans), len(out), 0, 0])
+            for e in out:
+                if e.allow is None:
+                    cls = EPSILON
+                else:
+                    cls = classes.setdefault(e.allow, len(classes))
+                trans.append((e.fr, e.to, cls, *blob(dict(e.data))))
+
+        position = {n.id: i for i, n in enumerate(nodes)}
+        incoming: List[List[int]] = [[] for _ in nodes]
+        for i, t in enumerate(trans):
+            incoming[position[t[1]]].append(i)
+        in_index = []
+        for i, lst in enumerate(incoming):
+            states[i][6] = len(in_index)
+            states[i][7] = len(lst)
+            in_index.extend(lst)
+
+        max_code = max((c.mask.bit_length() for c in classes), default=0)
+        class_width = max(16, (max_code + 7) // 8)
+
+        states_off = HEADER.size
+        trans_off = states_off + STATE.size * len(states)
+        in_off = trans_off + TRANS.size * len(trans)
+        classes_off = in_off + INDEX.size * len(in_index)
+        data_off = classes_off + class_width * len(classes)
+
+        out = bytearray(HEADER.pack(MAGIC, VERSION, class_width, len(states), len(trans), len(classes),
+                                    states_off, trans_off, in_off, classes_off, data_off))
+        for s in states:
+            out += STATE.pack(*s)
+        for t in trans:
+            out += TRANS.pack(*t)
+        for i in in_index:
+            out += INDEX.pack(i)
+        for c in classes:
+            out += c.to_bitmap(class_width)
+        out += data
+        with open(self.filename, 'wb') as f:
+            f.write(out)
+        return len(out)
+
+
+class SnapshotStorage(GraphStorage):
+    """
+    只读的快照存储后端，使用 mmap 映射快照文件
+    getNode / getOutDegree / getInDegree 只解码用到的记录，不会反序列化整个文件
+    """
+
+    def __init__(self, filename: str):
+        self._file = open(filename, 'rb')
+        try:
+            self._buf = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            self._file.close()
+            raise SnapshotFormatError(f"快照文件过短: {filename}")
+        # 没有显式 close 时，存储被回收后也会关闭文件和映射
+        self._finalizer = weakref.finalize(self, SnapshotStorage._release, self._buf, self._file)
+        if len(self._buf) < HEADER.size:
+            self.close()
+            raise SnapshotFormatError(f"快照文件过短: {filename}")
+        (magic, version, self._class_width, self._node_count, self._edge_count, self._class_count,
+         self._states_off, self._trans_off, self._in_off, self._classes_off, self._data_off) = \
+            HEADER.unpack_from(self._buf, 0)
+        if magic != MAGIC or version != VERSION:
+            self.close()
+            raise SnapshotFormatError(f"不是有效的图快照文件: {filename}")
+        self._classes: Dict[int, CharClass] = {}
+        self._names: Dict[Any, int] | None = None
+
+    @staticmethod
+    def _release(buf: mmap.mmap, file):
+        buf.close()
+        file.close()
+
+    def close(self):
+        """
+        关闭映射和文件，可以重复调用
+        """
+        self._finalizer()
+
+    def __enter__(self) -> SnapshotStorage:
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def _read_only(self, *args, **kwargs):
+        raise ReadOnlyGraphError("快照存储是只读的，请先复制到普通的 Graph")
+
+    insert_node = insert_edge = update_node = remove_node = set_all_tags = _read_only
+    remove_edge = remove_edges = reverse = renumber = _read_only
+
+    @property
+    def nodes(self) -> _RecordTable:
+        return _RecordTable(dict(enumerate(self.all_nodes())))
+
+    @property
+    def edges(self) -> _RecordTable:
+        return _RecordTable(dict(enumerate(self.all_edges())))
+
+    def _literal(self, off: int, length: int):
+        if not length:
+            return None
+        start = self._data_off + off
+        return ast.literal_eval(self._buf[start:start + length].decode())
+
+    def _state(self, i: int) -> tuple:
+        return STATE.unpack_from(self._buf, self._states_off + i * STATE.size)
+
+    def _position(self, nid: int) -> int:
+        lo, hi = 0, self._node_count
+        while lo < hi:
+            mid = (lo + hi) // 2
+            cur = INDEX.unpack_from(self._buf, self._states_off + mid * STATE.size)[0]
+            if cur < nid:
+                lo = mid + 1
+            else:
+                hi = mid
+        if lo < self._node_count and INDEX.unpack_from(self._buf, self._states_off + lo * STATE.size)[0] == nid:
+            return lo
+        return -1
+
+    def _node(self, state: tuple) -> Node:
+        nid, tag, meta_off, meta_len = state[:4]
+        meta = self._literal(meta_off, meta_len)
+        label, data = meta if meta is not None else (None, None)
+        return Node(label, tag, data, nid)
+
+    def _class(self, cls: int) -> CharClass | None:
+        if cls == EPSILON:
+            return None
+        ans = self._classes.get(cls)
+        if ans is None:
+            start = self._classes_off + cls * self._class_width
+            ans = CharClass.from_mask(int.from_bytes(self._buf[start:start + self._class_width], 'little'))
+            self._classes[cls] = ans
+        return ans
+
+    def _edge(self, i: int) -> Edge:
+        fr, to, cls, data_off, data_len = TRANS.unpack_from(self._buf, self._trans_off + i * TRANS.size)
+        return Edge(fr, to, self._class(cls), self._literal(data_off, data_len))
+
+    def lookup(self, name) -> int | None:
+        if self._names is None:
+            self._names = {}
+            for i in range(self._node_count):
+                state = self._state(i)
+                if state[3]:
+                    node = self._node(state)
+                    if node.label is not None:
+                        self._names[node.label] = node.id
+        return self._names.get(name)
+
+    def id_bound(self) -> int:
+        if not self._node_count:
+            return 0
+        return self._state(self._node_count - 1)[0] + 1
+
+    def has_node(self, nid: int) -> bool:
+        return self._position(nid) >= 0
+
+    def get_node(self, nid: int):
+        i = self._position(nid)
+        return None if i < 0 else self._node(self._state(i))
+
+    def out_edges(self, nid: int) -> Iterable:
+        i = self._position(nid)
+        if i < 0:
+            return []
+        state = self._state(i)
+        return [self._edge(j) for j in range(state[4], state[4] + state[5])]
+
+    def in_edges(self, nid: int) -> Iterable:
+        i = self._position(nid)
+        if i < 0:
+            return []
+        state = self._state(i)
+        return [self._edge(INDEX.unpack_from(self._buf, self._in_off + j * INDEX.size)[0])
+                for j in range(state[6], state[6] + state[7])]
+
+    def all_nodes(self) -> Iterable:
+        return [self._node(self._state(i)) for i in range(self._node_count)]
+
+    def all_edges(self) -> Iterable:
+        return [self._edge(i) for i in range(self._edge_count)]
+
+    def query_nodes(self, key: str, value: Any) -> Iterable:
+        if key == 'id':
+            node = self.get_node(value)
+            return [] if node is None else [node]
+        if key == 'name':
+            nid = self.lookup(value)
+            return [] if nid is None else [self.get_node(nid)]
+        if key == 'tag':
+            return [self._node(s) for s in map(self._state, range(self._node_count)) if s[1] == value]
+        return [_ for _ in self.all_nodes() if getattr(_, key) == value]
+
+    def query_edges(self, key: str, value: Any) -> Iterable:
+        if key == 'fr':
+            return self.out_edges(value)
+        if key == 'to':
+            return self.in_edges(value)
+        return [_ for _ in self.all_edges() if getattr(_, key) == value]
+
+    def node_count(self) -> int:
+        return self._node_count
+
+    def edge_count(self) -> int:
+        return self._edge_count
+
+
+def loadSnapshot(filename: str) -> Graph:
+    """
+    以 mmap 方式加载快照文件，返回只读的 Graph
+    需要修改时使用 CopyGraph().operate(g) 复制为普通的图
+    用完后调用 g.close()，或者使用 with loadSnapshot(filename) as g: 自动关闭
+    """
+    return Graph(storage=SnapshotStorage(filename))
@@ -27,7 +27,7 @@ from __future__ import annotations
 
 from typing import List, Any
 
-from .Graph import Graph, GraphOperator, NODE_TAG, Query, Edge, Node, GraphCompute
+from .Graph import Graph, GraphOperator, NODE_TAG, Edge, Node, GraphCompute
 
 class GetStartNodes(GraphCompute):
     """
@@ -35,10 +35,7 @@ class GetStartNodes(GraphCompute):
     """
 
     def compute(self, g: Graph) -> List[Node]:
-        q = Query()
-        st_nodes = [Node(**_) for _ in
-                    g.nodes.search((q.tag == NODE_TAG.START | NODE_TAG.END) | (q.tag == NODE_TAG.START))]
-        return st_nodes
+        return g.queryNodesByTag(NODE_TAG.START)
 
 
 class GetEndNodes(GraphCompute):
@@ -47,7 +44,4 @@ class GetEndNodes(GraphCompute):
     """
 
     def compute(self, g: Graph) -> List[Node]:
-        q = Query()
-        ed_nodes = [Node(**_) for _ in
-                    g.nodes.search((q.tag == NODE_TAG.START | NODE_TAG.END) | (q.tag == NODE_TAG.END))]
-        return ed_nodes
+        return g.queryNodesByTag(NODE_TAG.END)
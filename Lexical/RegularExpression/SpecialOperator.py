@@ -25,61 +25,117 @@ SOFTWARE.
 
 from __future__ import annotations
 
+from collections import deque
 from typing import List
 
-from .Graph import Graph, GraphOperator, NODE_TAG, Query, Edge, Node
+from .Graph import Graph, GraphOperator, GraphBuilder, NODE_TAG, Edge, Node
 from .BaseOperator import MakeSameTag
 from .SpecialCompute import GetStartNodes, GetEndNodes
-from .Function import getHash
+from .Pipeline import StructuralOperator
+from .View import ReversedGraphView, SubGraphView
+from .Error import EpsilonEliminationError
 
-class MakeVirtualNode(GraphOperator):
+class MakeVirtualNode(StructuralOperator):
     """
     实现创建虚拟节点操作，将节点标记为vst与ved
     """
 
+    MUTATES_INPUT = True
+
     def operate(self, g: Graph | None = None) -> Graph:
         st_nodes = GetStartNodes().compute(g)
         ed_nodes = GetEndNodes().compute(g)
 
         g = MakeSameTag(NODE_TAG.NORMAL).operate(g)
 
-        g.node('vst', NODE_TAG.START)
-        g.node('ved', NODE_TAG.END)
+        vst = g.node('vst', NODE_TAG.START)
+        ved = g.node('ved', NODE_TAG.END)
 
         for n in st_nodes:
-            g.edge('vst', n.name, None)
+            g.edge(vst, n.id, None)
         for n in ed_nodes:
-            g.edge(n.name, 'ved', None)
+            g.edge(n.id, ved, None)
 
         return g
 
-class MakeVirtualStartNode(GraphOperator):
+    def fuseBegin(self):
+        self.st_nodes = []
+        self.ed_nodes = []
+
+    def fuseNode(self, n: Node) -> Node:
+        if n.tag & NODE_TAG.START:
+            self.st_nodes.append(n.id)
+        if n.tag & NODE_TAG.END:
+            self.ed_nodes.append(n.id)
+        return n.replace(tag=NODE_TAG.NORMAL) if n.tag != NODE_TAG.NORMAL else n
+
+    def fuseEnd(self, new_id):
+        vst, ved = new_id(), new_id()
+        nodes = [Node('vst', NODE_TAG.START, id=vst), Node('ved', NODE_TAG.END, id=ved)]
+        edges = [Edge(vst, _, None) for _ in self.st_nodes] + [Edge(_, ved, None) for _ in self.ed_nodes]
+        return nodes, edges
+
+class MakeVirtualStartNode(StructuralOperator):
     """
     实现创建虚拟节点操作，将节点标记为vst
     """
 
+    MUTATES_INPUT = True
+
     def operate(self, g: Graph | None = None) -> Graph:
         st_nodes = GetStartNodes().compute(g)
         for n in st_nodes:
-            n.tag = NODE_TAG.NORMAL
-            g.updateNode(n)
-        g.node('vst', NODE_TAG.START)
+            g.updateNode(n.replace(tag=NODE_TAG.NORMAL))
+        vst = g.node('vst', NODE_TAG.START)
         for n in st_nodes:
-            g.edge('vst', n.name, None)
+            g.edge(vst, n.id, None)
         return g
 
-class ReverseGraph(GraphOperator):
+    def fuseBegin(self):
+        self.st_nodes = []
+
+    def fuseNode(self, n: Node) -> Node:
+        if n.tag & NODE_TAG.START:
+            self.st_nodes.append(n.id)
+            return n.replace(tag=NODE_TAG.NORMAL)
+        return n
+
+    def fuseEnd(self, new_id):
+        vst = new_id()
+        return [Node('vst', NODE_TAG.START, id=vst)], [Edge(vst, _, None) for _ in self.st_nodes]
+
+class ReverseGraph(StructuralOperator):
     """
     反转图中所有的边
+    inplace=True 时直接交换 g 的正向、反向邻接表
     """
 
     def operate(self, g: Graph | None = None) -> Graph:
-        new_g = Graph(g.getAllNodes())
+        if self.inplace:
+            g.reverseEdges()
+            return g
+        builder = GraphBuilder().addNodes(g.getAllNodes())
         for e in g.getAllEdges():
-            new_g.edge(e.to, e.fr, e.allow, e.data)
-        return new_g
+            builder.addEdge(e.to, e.fr, e.allow, e.data)
+        return builder.build()
+
+    def fuseEdge(self, e: Edge) -> Edge:
+        return e.replace(fr=e.to, to=e.fr)
 
-class ReverseTag(GraphOperator):
+class ReverseView(GraphOperator):
+    """
+    返回输入图的反转视图，不复制整张图
+    swap_tags=True 时同时反转开始结束节点tag，效果等价于 ReverseGraph + ReverseTag
+    """
+
+    def __init__(self, swap_tags=True):
+        self.swap_tags = swap_tags
+        super().__init__()
+
+    def operate(self, g: Graph | None = None) -> Graph:
+        return ReversedGraphView(g, self.swap_tags)
+
+class ReverseTag(StructuralOperator):
     """
     反转途中节点的标记
     Start -> End
@@ -87,43 +143,169 @@ class ReverseTag(GraphOperator):
     Normal -> Normal
     """
 
+    MUTATES_INPUT = True
+
     def operate(self, g: Graph | None = None) -> Graph:
         for n in g.getAllNodes():
-            if n.tag == NODE_TAG.NORMAL:
-                continue
-            n.tag = bool(n.tag & NODE_TAG.START) * NODE_TAG.END + bool(n.tag & NODE_TAG.END) * NODE_TAG.START
-            g.updateNode(n)
+            if n.tag != NODE_TAG.NORMAL:
+                g.updateNode(self.fuseNode(n))
         return g
 
+    def fuseNode(self, n: Node) -> Node:
+        if n.tag == NODE_TAG.NORMAL:
+            return n
+        tag = bool(n.tag & NODE_TAG.START) * NODE_TAG.END + bool(n.tag & NODE_TAG.END) * NODE_TAG.START
+        return n.replace(tag=tag)
+
 class ReachableCut(GraphOperator):
     """
     不可到达裁剪，裁剪掉所有不可到达的节点和相关联的边
+    inplace=True 时直接在 g 上删除不可达节点，view=True 时返回只包含可达节点的 SubGraphView
     """
 
+    def __init__(self, inplace=False, view=False):
+        self.view = view
+        super().__init__(inplace)
+
     def operate(self, g: Graph | None = None) -> Graph:
         st_nodes = GetStartNodes().compute(g)
-        qu = [n.name for n in st_nodes]
+        qu = deque(n.id for n in st_nodes)
         reachable = set()
         while qu:
-            pos = qu.pop(0)
+            pos = qu.popleft()
             if pos in reachable:
                 continue
             reachable.add(pos)
             for e in g.getOutDegree(pos):
                 qu.append(e.to)
+        if self.view:
+            return SubGraphView(g, reachable)
+        if self.inplace:
+            for n in g.getAllNodes():
+                if n.id not in reachable:
+                    g.deleteNode(n.id)
+            return g
         return Graph(
             nodes=[
-                n for n in g.getAllNodes() if n.name in reachable
+                n for n in g.getAllNodes() if n.id in reachable
             ],
             edges=[
                 e for e in g.getAllEdges() if e.fr in reachable and e.to in reachable
             ]
         )
 
+class DeadStateCut(GraphOperator):
+    """
+    死状态裁剪，沿反向邻接表从所有终止节点出发，裁剪掉无法到达任何终止节点的节点和相关联的边
+    起始节点总是保留，保证语言为空时图仍然有起点
+    inplace=True 时直接在 g 上删除死状态，view=True 时返回只包含存活节点的 SubGraphView
+    """
+
+    def __init__(self, inplace=False, view=False):
+        self.view = view
+        super().__init__(inplace)
+
+    def operate(self, g: Graph | None = None) -> Graph:
+        qu = deque(n.id for n in GetEndNodes().compute(g))
+        alive = set(qu)
+        while qu:
+            pos = qu.popleft()
+            for e in g.getInDegree(pos):
+                if e.fr not in alive:
+                    alive.add(e.fr)
+                    qu.append(e.fr)
+        alive.update(n.id for n in GetStartNodes().compute(g))
+        if self.view:
+            return SubGraphView(g, alive)
+        if self.inplace:
+            for n in g.getAllNodes():
+                if n.id not in alive:
+                    g.deleteNode(n.id)
+            return g
+        return Graph(
+            nodes=[n for n in g.getAllNodes() if n.id in alive],
+            edges=[e for e in g.getAllEdges() if e.fr in alive and e.to in alive]
+        )
+
+class EliminateEpsilon(GraphOperator):
+    """
+    消除空边，得到等价的无空边NFA
+    节点 n 经过空闭包中任意节点的字符边可以到达的节点，都改为由 n 直接连接，同一对节点之间 data 相同的边合并 allow；
+    空闭包中包含终止节点时 n 也成为终止节点并继承其 data，data 冲突时使用 conflict_callback 解决
+    只经过空边才能到达的节点在消除后不可达，会被一并删除
+    inplace=True 时直接修改 g
+    """
+
+    def __init__(self, conflict_callback=None, inplace=False):
+        self.conflict_callback = conflict_callback
+        super().__init__(inplace)
+
+    def operate(self, g: Graph | None = None) -> Graph:
+
+        def closure(n: int) -> List[int]:
+            ans = {n}
+            stack = [n]
+            while stack:
+                for e in g.getOutDegree(stack.pop()):
+                    if e.allow is None and e.to not in ans:
+                        ans.add(e.to)
+                        stack.append(e.to)
+            return sorted(ans)
+
+        order = [n.id for n in GetStartNodes().compute(g)]  # 按可达顺序排列的节点编号
+        seen = set(order)
+        qu = deque(order)
+        nodes = {}  # 节点编号 -> 消除后的节点
+        moves = {}  # 节点编号 -> {(终止节点编号, 边的data): allow}
+        while qu:
+            nid = qu.popleft()
+            node = g.getNode(nid)
+            tag, data = node.tag, dict(node.data)
+            out = moves[nid] = {}
+            for m in closure(nid):
+                if m != nid:
+                    mt = g.getNode(m)
+                    if mt.tag & NODE_TAG.END:
+                        tag |= NODE_TAG.END
+                        if data.keys() & mt.data.keys():
+                            if self.conflict_callback is None:
+                                raise EpsilonEliminationError("合并出错，存在二义性")
+                            data = self.conflict_callback(data, mt.data)
+                        else:
+                            data.update(mt.data)
+                for e in g.getOutDegree(m):
+                    if e.allow is None:
+                        continue
+                    key = (e.to, e.data)
+                    out[key] = out[key] | e.allow if key in out else e.allow
+                    if e.to not in seen:
+                        seen.add(e.to)
+                        order.append(e.to)
+                        qu.append(e.to)
+            nodes[nid] = node.replace(tag=tag, data=data)
+
+        edges = [Edge(fr, to, allow, data) for fr in order for (to, data), allow in moves[fr].items()]
+        if self.inplace:
+            for n in g.getAllNodes():
+                if n.id not in nodes:
+                    g.deleteNode(n.id)
+            for nid in order:
+                if nodes[nid] != g.getNode(nid):
+                    g.updateNode(nodes[nid])
+                g.removeEdges(list(g.getOutDegree(nid)))
+            for e in edges:
+                g.edge(e.fr, e.to, e.allow, e.data)
+            return g
+        return Graph(nodes=[nodes[nid] for nid in sorted(nodes)], edges=edges)
+
+
 class AddDataToEndNode(GraphOperator):
     """
     向图中的所有终止节点添加data数据
     """
+
+    MUTATES_INPUT = True
+
     def __init__(self, expr='', priority=0):
         self.expr = expr
         self.priority = priority
@@ -132,6 +314,5 @@ class AddDataToEndNode(GraphOperator):
     def operate(self, g: Graph | None = None) -> Graph:
         for n in g.getAllNodes():
             if n.tag & NODE_TAG.END:
-                n.data.update(dict(raw=(self.expr, self.priority)))
-                g.updateNode(n)
+                g.updateNode(n.replace(data=dict(n.data, raw=(self.expr, self.priority))))
         return g
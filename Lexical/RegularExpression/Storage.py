@@ -0,0 +1,495 @@
+"""
+MIT License
+
+Copyright (c) 2023 Csome陈绍民
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+
+
+from __future__ import annotations
+
+import sys
+from abc import ABC, abstractmethod
+from typing import Any, Dict, Iterable, List
+
+try:
+    from tinydb import TinyDB, Query
+    from tinydb.storages import MemoryStorage
+except ImportError:  # tinydb 是可选依赖
+    TinyDB = Query = MemoryStorage = None
+
+
+class GraphStorage(ABC):
+    """
+    图存储后端抽象类，节点使用稠密的整数编号作为主键
+    节点记录: Node 对象，label 为可选的显示名称
+    边记录: Edge 对象，fr/to 为节点编号
+    Node 与 Edge 都是不可变对象，后端可以直接返回内部保存的记录
+    """
+
+    @abstractmethod
+    def insert_node(self, node):
+        pass
+
+    @abstractmethod
+    def insert_edge(self, edge):
+        pass
+
+    @abstractmethod
+    def lookup(self, name) -> int | None:
+        """
+        名称表查询，根据显示名称获得节点编号
+        """
+        pass
+
+    @abstractmethod
+    def id_bound(self) -> int:
+        """
+        当前最大节点编号 + 1，新节点从这里开始分配编号
+        """
+        pass
+
+    @abstractmethod
+    def has_node(self, nid: int) -> bool:
+        pass
+
+    @abstractmethod
+    def get_node(self, nid: int):
+        pass
+
+    @abstractmethod
+    def update_node(self, node):
+        pass
+
+    @abstractmethod
+    def remove_node(self, nid: int):
+        pass
+
+    @abstractmethod
+    def set_all_tags(self, tag: int):
+        pass
+
+    @abstractmethod
+    def remove_edge(self, edge):
+        """
+        删除一条与 edge 相等的边
+        """
+        pass
+
+    def remove_edges(self, edges: Iterable):
+        """
+        批量删除边，每条边删除一条与之相等的记录
+        """
+        for e in edges:
+            self.remove_edge(e)
+
+    @abstractmethod
+    def reverse(self):
+        """
+        原地反转所有的边
+        """
+        pass
+
+    @abstractmethod
+    def renumber(self, offset: int, keep_names: bool):
+        """
+        原地将所有状态编号加上 offset，keep_names=False 时清空名称表
+        """
+        pass
+
+    @abstractmethod
+    def out_edges(self, nid: int) -> Iterable:
+        pass
+
+    @abstractmethod
+    def in_edges(self, nid: int) -> Iterable:
+        pass
+
+    @abstractmethod
+    def all_nodes(self) -> Iterable:
+        pass
+
+    @abstractmethod
+    def all_edges(self) -> Iterable:
+        pass
+
+    @abstractmethod
+    def query_nodes(self, key: str, value: Any) -> Iterable:
+        pass
+
+    @abstractmethod
+    def query_edges(self, key: str, value: Any) -> Iterable:
+        pass
+
+    def nodes_with_tag(self, bit: int) -> Iterable:
+        """
+        所有 tag 包含 bit 中任意一位的节点，tag 值大的节点在前
+        """
+        return sorted((_ for _ in self.all_nodes() if _.tag & bit), key=lambda n: -n.tag)
+
+    def nodes_with_data(self, key: str) -> Iterable:
+        """
+        所有 data 中含有 key 的节点
+        """
+        return [_ for _ in self.all_nodes() if key in _.data]
+
+    def sizeof(self) -> int:
+        """
+        存储后端自身索引结构的近似内存占用，不含节点和边记录
+        """
+        return 0
+
+    def close(self):
+        """
+        释放存储后端持有的外部资源（文件、映射等），内存后端不需要释放
+        """
+        pass
+
+    @abstractmethod
+    def node_count(self) -> int:
+        pass
+
+    @abstractmethod
+    def edge_count(self) -> int:
+        pass
+
+
+class _RecordTable:
+    """
+    NativeStorage 的只读表视图，保留 g.nodes.all() / len(g.nodes) 的用法
+    """
+
+    def __init__(self, records: Dict):
+        self._records = records
+
+    def all(self) -> List[dict]:
+        return list(self._records.values())
+
+    def __iter__(self):
+        return iter(self._records.values())
+
+    def __len__(self):
+        return len(self._records)
+
+
+class NativeStorage(GraphStorage):
+    """
+    原生内存存储，节点按编号哈希索引，边使用正向、反向邻接表
+    名称表只保存有显示名称的节点，所有按编号、名称和端点的查询都是 O(结果数)
+    另外维护 tag 索引和 indexed_keys 中 data 键的索引，按 tag 或 data 键查节点也是 O(结果数)
+    """
+
+    INDEXED_KEYS = ('raw',)
+
+    def __init__(self, indexed_keys: Iterable[str] = INDEXED_KEYS):
+        self._nodes: Dict[int, Any] = {}
+        self._names: Dict[Any, int] = {}
+        self._tags: Dict[int, Dict[int, None]] = {}  # tag -> 有序的节点编号集合
+        self._data_keys: Dict[str, Dict[int, None]] = {k: {} for k in indexed_keys}
+        self._edges: Dict[int, Any] = {}
+        self._out: Dict[int, Dict[int, Any]] = {}  # 节点编号 -> {边编号: 边记录}
+        self._in: Dict[int, Dict[int, Any]] = {}
+        self._edge_id = 0
+        self._id_bound = 0
+
+    @property
+    def nodes(self) -> _RecordTable:
+        return _RecordTable(self._nodes)
+
+    @property
+    def edges(self) -> _RecordTable:
+        return _RecordTable(self._edges)
+
+    def _index(self, node):
+        self._tags.setdefault(node.tag, {})[node.id] = None
+        for k, ids in self._data_keys.items():
+            if k in node.data:
+                ids[node.id] = None
+
+    def _unindex(self, node):
+        bucket = self._tags[node.tag]
+        del bucket[node.id]
+        if not bucket:
+            del self._tags[node.tag]
+        for ids in self._data_keys.values():
+            ids.pop(node.id, None)
+
+    def _reindex(self):
+        self._tags = {}
+        self._data_keys = {k: {} for k in self._data_keys}
+        for node in self._nodes.values():
+            self._index(node)
+
+    def insert_node(self, node):
+        nid = node.id
+        self._nodes[nid] = node
+        self._index(node)
+        if node.label is not None:
+            self._names[node.label] = nid
+        self._out[nid] = {}
+        self._in[nid] = {}
+        if nid >= self._id_bound:
+            self._id_bound = nid + 1
+
+    def insert_edge(self, edge):
+        eid = self._edge_id
+        self._edge_id += 1
+        self._edges[eid] = edge
+        self._out[edge.fr][eid] = edge
+        self._in[edge.to][eid] = edge
+
+    def lookup(self, name) -> int | None:
+        return self._names.get(name)
+
+    def id_bound(self) -> int:
+        return self._id_bound
+
+    def has_node(self, nid: int) -> bool:
+        return nid in self._nodes
+
+    def get_node(self, nid: int):
+        return self._nodes.get(nid)
+
+    def update_node(self, node):
+        old = self._nodes[node.id]
+        self._unindex(old)
+        self._nodes[node.id] = node = node.replace(name=old.label)
+        self._index(node)
+
+    def remove_node(self, nid: int):
+        node = self._nodes.pop(nid)
+        self._unindex(node)
+        if node.label is not None:
+            del self._names[node.label]
+        for eid, edge in list(self._out.pop(nid).items()):
+            self._edges.pop(eid, None)
+            self._in[edge.to].pop(eid, None)
+        for eid, edge in list(self._in.pop(nid).items()):
+            self._edges.pop(eid, None)
+            self._out[edge.fr].pop(eid, None)
+
+    def set_all_tags(self, tag: int):
+        for nid, node in self._nodes.items():
+            if node.tag != tag:
+                self._nodes[nid] = node.replace(tag=tag)
+        self._tags = {tag: dict.fromkeys(self._nodes)} if self._nodes else {}
+
+    def remove_edge(self, edge):
+        out = self._out[edge.fr]
+        for eid, e in out.items():
+            if e == edge:
+                del out[eid]
+                del self._in[e.to][eid]
+                del self._edges[eid]
+                return
+        raise KeyError(edge)
+
+    def remove_edges(self, edges: Iterable):
+        # 按起点分组，每个起点的出边表只扫描一次
+        pending: Dict[int, Dict[Any, int]] = {}
+        for e in edges:
+            counter = pending.setdefault(e.fr, {})
+            counter[e] = counter.get(e, 0) + 1
+        for fr, counter in pending.items():
+            out = self._out[fr]
+            for eid, e in list(out.items()):
+                if counter.get(e):
+                    counter[e] -= 1
+                    del out[eid]
+                    del self._in[e.to][eid]
+                    del self._edges[eid]
+            if any(counter.values()):
+                raise KeyError(next(e for e, c in counter.items() if c))
+
+    def reverse(self):
+        self._edges = {eid: e.replace(fr=e.to, to=e.fr) for eid, e in self._edges.items()}
+        self._out, self._in = self._in, self._out
+        for adj in (self._out, self._in):
+            for nid, records in adj.items():
+                adj[nid] = {eid: self._edges[eid] for eid in records}
+
+    def renumber(self, offset: int, keep_names: bool):
+        self._nodes = {
+            nid + offset: node.replace(id=nid + offset, name=node.label if keep_names else None)
+            for nid, node in self._nodes.items()
+        }
+        self._names = {k: v + offset for k, v in self._names.items()} if keep_names else {}
+        self._edges = {eid: e.replace(fr=e.fr + offset, to=e.to + offset) for eid, e in self._edges.items()}
+        for name in ('_out', '_in'):
+            setattr(self, name, {
+                nid + offset: {eid: self._edges[eid] for eid in records}
+                for nid, records in getattr(self, name).items()
+            })
+        self._id_bound = max((nid + 1 for nid in self._nodes), default=0)
+        self._reindex()
+
+    def out_edges(self, nid: int) -> Iterable:
+        return self._out.get(nid, {}).values()
+
+    def in_edges(self, nid: int) -> Iterable:
+        return self._in.get(nid, {}).values()
+
+    def all_nodes(self) -> Iterable:
+        return self._nodes.values()
+
+    def all_edges(self) -> Iterable:
+        return self._edges.values()
+
+    def query_nodes(self, key: str, value: Any) -> Iterable:
+        if key == 'id':
+            node = self._nodes.get(value)
+            return [node] if node is not None else []
+        if key == 'name':
+            return self.query_nodes('id', self._names.get(value))
+        if key == 'tag':
+            return [self._nodes[_] for _ in self._tags.get(value, ())]
+        return [_ for _ in self._nodes.values() if getattr(_, key) == value]
+
+    def nodes_with_tag(self, bit: int) -> Iterable:
+        return [self._nodes[nid] for tag in sorted(self._tags, reverse=True) if tag & bit for nid in self._tags[tag]]
+
+    def nodes_with_data(self, key: str) -> Iterable:
+        if key in self._data_keys:
+            return [self._nodes[_] for _ in self._data_keys[key]]
+        return super().nodes_with_data(key)
+
+    def query_edges(self, key: str, value: Any) -> Iterable:
+        if key == 'fr':
+            return self.out_edges(value)
+        if key == 'to':
+            return self.in_edges(value)
+        return [_ for _ in self._edges.values() if getattr(_, key) == value]
+
+    def sizeof(self) -> int:
+        size = sum(map(sys.getsizeof, (self._nodes, self._names, self._edges, self._out, self._in, self._tags)))
+        size += sum(sys.getsizeof(_) for adj in (self._out, self._in) for _ in adj.values())
+        size += sum(map(sys.getsizeof, self._tags.values())) + sum(map(sys.getsizeof, self._data_keys.values()))
+        return size
+
+    def node_count(self) -> int:
+        return len(self._nodes)
+
+    def edge_count(self) -> int:
+        return len(self._edges)
+
+
+class TinyDBStorage(GraphStorage):
+    """
+    基于 TinyDB 的存储后端，需要安装 tinydb
+    所有查询都会进行全表扫描，仅用于调试或与旧数据兼容
+    """
+
+    def __init__(self):
+        if TinyDB is None:
+            raise ImportError("TinyDBStorage 需要安装 tinydb: python -m pip install tinydb")
+        self.nodes = TinyDB(storage=MemoryStorage)
+        self.edges = TinyDB(storage=MemoryStorage)
+        self._id_bound = 0
+
+    def insert_node(self, node):
+        self.nodes.insert(dict(id=node.id, name=node.label, tag=node.tag, data=node.data))
+        self._id_bound = max(self._id_bound, node.id + 1)
+
+    def insert_edge(self, edge):
+        self.edges.insert(dict(fr=edge.fr, to=edge.to, allow=edge.allow, data=edge.data))
+
+    @staticmethod
+    def _nodes(docs) -> List:
+        from .Graph import Node  # Graph 模块依赖本模块，这里延迟导入
+        return [Node(**_) for _ in docs]
+
+    @staticmethod
+    def _edges(docs) -> List:
+        from .Graph import Edge
+        return [Edge(**_) for _ in docs]
+
+    def lookup(self, name) -> int | None:
+        ans = self.nodes.get(Query().name == name)
+        return None if ans is None else ans['id']
+
+    def id_bound(self) -> int:
+        return self._id_bound
+
+    def has_node(self, nid: int) -> bool:
+        return self.nodes.contains(Query().id == nid)
+
+    def get_node(self, nid: int):
+        ans = self.nodes.get(Query().id == nid)
+        return None if ans is None else self._nodes([ans])[0]
+
+    def update_node(self, node):
+        self.nodes.update(dict(tag=node.tag, data=node.data), Query().id == node.id)
+
+    def remove_node(self, nid: int):
+        q = Query()
+        self.nodes.remove(q.id == nid)
+        self.edges.remove((q.fr == nid) | (q.to == nid))
+
+    def set_all_tags(self, tag: int):
+        self.nodes.update(dict(tag=tag), Query().tag != tag)
+
+    def remove_edge(self, edge):
+        q = Query()
+        docs = self.edges.search((q.fr == edge.fr) & (q.to == edge.to) & (q.allow == edge.allow) & (q.data == edge.data))
+        if not docs:
+            raise KeyError(edge)
+        self.edges.remove(doc_ids=[docs[0].doc_id])
+
+    def reverse(self):
+        def swap(doc):
+            doc['fr'], doc['to'] = doc['to'], doc['fr']
+        self.edges.update(swap)
+
+    def renumber(self, offset: int, keep_names: bool):
+        def node(doc):
+            doc['id'] += offset
+            if not keep_names:
+                doc['name'] = None
+
+        def edge(doc):
+            doc['fr'] += offset
+            doc['to'] += offset
+        self.nodes.update(node)
+        self.edges.update(edge)
+        self._id_bound = max((_['id'] + 1 for _ in self.nodes.all()), default=0)
+
+    def out_edges(self, nid: int) -> Iterable:
+        return self._edges(self.edges.search(Query().fr == nid))
+
+    def in_edges(self, nid: int) -> Iterable:
+        return self._edges(self.edges.search(Query().to == nid))
+
+    def all_nodes(self) -> Iterable:
+        return self._nodes(self.nodes.all())
+
+    def all_edges(self) -> Iterable:
+        return self._edges(self.edges.all())
+
+    def query_nodes(self, key: str, value: Any) -> Iterable:
+        return self._nodes(self.nodes.search(Query()[key] == value))
+
+    def query_edges(self, key: str, value: Any) -> Iterable:
+        return self._edges(self.edges.search(Query()[key] == value))
+
+    def node_count(self) -> int:
+        return len(self.nodes)
+
+    def edge_count(self) -> int:
+        return len(self.edges)
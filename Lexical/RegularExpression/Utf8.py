@@ -0,0 +1,116 @@
+"""
+MIT License
+
+Copyright (c) 2023 Csome陈绍民
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+
+
+
+
+from __future__ import annotations
+
+from typing import Dict, List, Tuple
+
+from .Graph import Graph, GraphOperator, NODE_TAG
+from .CharClass import CharClass
+from .BaseOperator import CopyGraph
+
+ASCII = CharClass.from_range(0, 0x7F)
+MAX_CODE = 0x10FFFF
+SURROGATE = (0xD800, 0xDFFF)
+
+
+def utf8_sequences(lo: int, hi: int) -> List[List[Tuple[int, int]]]:
+    """
+    将码点闭区间 [lo, hi] 拆分为若干个 UTF-8 字节区间序列，每个序列的每个字节都是一个连续区间
+    代理区 U+D800..U+DFFF 没有 UTF-8 编码，会被跳过
+    >>> utf8_sequences(0x61, 0x3B1)
+    [[(97, 127)], [(194, 205), (128, 191)], [(206, 206), (128, 177)]]
+    """
+    ans = []
+    stack = [(lo, min(hi, MAX_CODE))]
+    while stack:
+        lo, hi = stack.pop()
+        if lo > hi:
+            continue
+        if lo <= SURROGATE[1] and hi >= SURROGATE[0]:
+            stack.append((SURROGATE[1] + 1, hi))
+            stack.append((lo, SURROGATE[0] - 1))
+            continue
+        # 先按编码长度拆分
+        bound = next((b for b in (0x7F, 0x7FF, 0xFFFF) if lo <= b < hi), None)
+        if bound is not None:
+            stack.append((bound + 1, hi))
+            stack.append((lo, bound))
+            continue
+        # 再拆分到每个后续字节都覆盖完整的区间
+        split = None
+        for i in range(1, len(chr(lo).encode())):
+            m = (1 << (6 * i)) - 1
+            if lo & ~m != hi & ~m:
+                if lo & m:
+                    split = lo | m
+                elif hi & m != m:
+                    split = (hi & ~m) - 1
+                if split is not None:
+                    break
+        if split is not None:
+            stack.append((split + 1, hi))
+            stack.append((lo, split))
+            continue
+        ans.append(list(zip(chr(lo).encode(), chr(hi).encode())))
+    return ans
+
+
+class Utf8Encode(GraphOperator):
+    """
+    将边上的码点集合转换为 UTF-8 字节序列，得到可以直接在原始字节上运行的自动机，字母表为 0..255
+    ASCII 部分仍然是一条边，其余部分按 utf8_sequences 拆成若干条字节链，
+    同一条边的字节链共享相同的前缀状态；结果一般是 NFA，需要再进行子集构造
+    所有边都只包含 ASCII 时原样返回
+    inplace=True 时直接修改 g
+    """
+
+    def operate(self, g: Graph | None = None) -> Graph:
+        edges = [e for e in g.getAllEdges() if e.allow is not None and not e.allow.issubset(ASCII)]
+        if not edges:
+            return g
+        if not self.inplace:
+            g = CopyGraph().operate(g)
+        g.removeEdges(edges)
+        for e in edges:
+            ascii_part = e.allow & ASCII
+            if ascii_part:
+                g.edge(e.fr, e.to, ascii_part, e.data)
+            prefix: Dict[tuple, int] = {(): e.fr}  # 字节区间前缀 -> 中间状态
+            last: Dict[int, CharClass] = {}  # 最后一个字节所在状态 -> 最后一个字节的集合
+            for lo, hi in (e.allow - ASCII).ranges():
+                for seq in utf8_sequences(lo, hi):
+                    for k in range(1, len(seq)):
+                        key = tuple(seq[:k])
+                        if key not in prefix:
+                            prefix[key] = g.node(None, NODE_TAG.NORMAL)
+                            g.edge(prefix[key[:-1]], prefix[key], CharClass.from_range(*seq[k - 1]))
+                    cur = prefix[tuple(seq[:-1])]
+                    last[cur] = last.get(cur, CharClass()) | CharClass.from_range(*seq[-1])
+            for cur, allow in last.items():
+                g.edge(cur, e.to, allow, e.data)
+        return g
@@ -0,0 +1,216 @@
+"""
+MIT License
+
+Copyright (c) 2023 Csome陈绍民
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+
+
+
+from __future__ import annotations
+
+from typing import Any, Dict, Iterable
+
+from .Error import ReadOnlyGraphError
+from .Graph import Graph, Node, Edge, NODE_TAG
+from .Storage import GraphStorage, _RecordTable
+
+
+def _swap_tag(tag: int) -> int:
+    return bool(tag & NODE_TAG.START) * NODE_TAG.END + bool(tag & NODE_TAG.END) * NODE_TAG.START
+
+
+class _ViewStorage(GraphStorage):
+    """
+    只读视图存储，所有修改操作都会抛出 ReadOnlyGraphError
+    """
+
+    def __init__(self, base: GraphStorage):
+        self.base = base
+
+    def _read_only(self, *args, **kwargs):
+        raise ReadOnlyGraphError("图视图是只读的，请先使用 CopyGraph().operate(g) 复制")
+
+    insert_node = insert_edge = update_node = remove_node = set_all_tags = _read_only
+    remove_edge = remove_edges = reverse = renumber = _read_only
+
+    @property
+    def nodes(self) -> _RecordTable:
+        return _RecordTable(dict(enumerate(self.all_nodes())))
+
+    @property
+    def edges(self) -> _RecordTable:
+        return _RecordTable(dict(enumerate(self.all_edges())))
+
+    def id_bound(self) -> int:
+        return self.base.id_bound()
+
+    def query_nodes(self, key: str, value: Any) -> Iterable:
+        if key == 'id':
+            node = self.get_node(value)
+            return [] if node is None else [node]
+        if key == 'name':
+            nid = self.lookup(value)
+            return [] if nid is None else [self.get_node(nid)]
+        return [_ for _ in self.all_nodes() if getattr(_, key) == value]
+
+    def query_edges(self, key: str, value: Any) -> Iterable:
+        if key == 'fr':
+            return self.out_edges(value)
+        if key == 'to':
+            return self.in_edges(value)
+        return [_ for _ in self.all_edges() if getattr(_, key) == value]
+
+
+class _ReversedStorage(_ViewStorage):
+    """
+    反转后的边按原始边缓存，重复访问同一条边时返回同一个对象
+    缓存条目超过底层边数的两倍时清空，避免底层图修改后旧的边一直留在缓存中
+    """
+
+    def __init__(self, base: GraphStorage, swap_tags: bool):
+        super().__init__(base)
+        self.swap_tags = swap_tags
+        self._flipped: Dict[Edge, Edge] = {}
+
+    def _flip(self, edges: Iterable[Edge]) -> list:
+        cache = self._flipped
+        if len(cache) > 2 * self.base.edge_count() + 64:
+            cache.clear()
+        result = []
+        for e in edges:
+            r = cache.get(e)
+            if r is None:
+                r = cache[e] = e.replace(fr=e.to, to=e.fr)
+            result.append(r)
+        return result
+
+    def _node(self, node: Node | None) -> Node | None:
+        if node is None or not self.swap_tags or node.tag == NODE_TAG.NORMAL:
+            return node
+        return node.replace(tag=_swap_tag(node.tag))
+
+    def lookup(self, name) -> int | None:
+        return self.base.lookup(name)
+
+    def has_node(self, nid: int) -> bool:
+        return self.base.has_node(nid)
+
+    def get_node(self, nid: int):
+        return self._node(self.base.get_node(nid))
+
+    def out_edges(self, nid: int) -> Iterable:
+        return self._flip(self.base.in_edges(nid))
+
+    def in_edges(self, nid: int) -> Iterable:
+        return self._flip(self.base.out_edges(nid))
+
+    def all_nodes(self) -> Iterable:
+        return list(map(self._node, self.base.all_nodes()))
+
+    def all_edges(self) -> Iterable:
+        return self._flip(self.base.all_edges())
+
+    def query_nodes(self, key: str, value: Any) -> Iterable:
+        if key == 'tag':
+            return list(map(self._node, self.base.query_nodes('tag', _swap_tag(value) if self.swap_tags else value)))
+        return super().query_nodes(key, value)
+
+    def nodes_with_tag(self, bit: int) -> Iterable:
+        return list(map(self._node, self.base.nodes_with_tag(_swap_tag(bit) if self.swap_tags else bit)))
+
+    def nodes_with_data(self, key: str) -> Iterable:
+        return list(map(self._node, self.base.nodes_with_data(key)))
+
+    def node_count(self) -> int:
+        return self.base.node_count()
+
+    def edge_count(self) -> int:
+        return self.base.edge_count()
+
+
+class _SubGraphStorage(_ViewStorage):
+
+    def __init__(self, base: GraphStorage, nodes: Iterable[int]):
+        super().__init__(base)
+        self.ids: Dict[int, None] = {_: None for _ in nodes if base.has_node(_)}
+
+    def lookup(self, name) -> int | None:
+        nid = self.base.lookup(name)
+        return nid if nid in self.ids else None
+
+    def has_node(self, nid: int) -> bool:
+        return nid in self.ids
+
+    def get_node(self, nid: int):
+        return self.base.get_node(nid) if nid in self.ids else None
+
+    def out_edges(self, nid: int) -> Iterable:
+        if nid not in self.ids:
+            return []
+        return [e for e in self.base.out_edges(nid) if e.to in self.ids]
+
+    def in_edges(self, nid: int) -> Iterable:
+        if nid not in self.ids:
+            return []
+        return [e for e in self.base.in_edges(nid) if e.fr in self.ids]
+
+    def all_nodes(self) -> Iterable:
+        return [self.base.get_node(_) for _ in self.ids]
+
+    def all_edges(self) -> Iterable:
+        return [e for nid in self.ids for e in self.out_edges(nid)]
+
+    def nodes_with_tag(self, bit: int) -> Iterable:
+        return [_ for _ in self.base.nodes_with_tag(bit) if _.id in self.ids]
+
+    def nodes_with_data(self, key: str) -> Iterable:
+        return [_ for _ in self.base.nodes_with_data(key) if _.id in self.ids]
+
+    def node_count(self) -> int:
+        return len(self.ids)
+
+    def edge_count(self) -> int:
+        return sum(len(self.out_edges(_)) for _ in self.ids)
+
+
+class ReversedGraphView(Graph):
+    """
+    图的反转视图，不复制整张图，出度与入度互换
+    反转的边在第一次访问时生成并缓存，之后重复使用
+    swap_tags=True 时同时交换 START 与 END 标记，等价于 ReverseGraph + ReverseTag 的结果
+    视图是只读的，底层的图被修改后视图立即反映修改
+    >>> r = ReversedGraphView(g, swap_tags=True)
+    >>> r.getOutDegree(n) == [e.replace(fr=e.to, to=e.fr) for e in g.getInDegree(n)]
+    True
+    """
+
+    def __init__(self, g: Graph, swap_tags=False):
+        super().__init__(storage=_ReversedStorage(g.storage, swap_tags))
+
+
+class SubGraphView(Graph):
+    """
+    只包含指定节点以及它们之间的边的子图视图，不复制节点和边
+    >>> s = SubGraphView(g, reachable)
+    """
+
+    def __init__(self, g: Graph, nodes: Iterable[int]):
+        super().__init__(storage=_SubGraphStorage(g.storage, nodes))
@@ -32,15 +32,19 @@ template = '''
 FILE *file = NULL;
 FILE *out = NULL;
 #define SIZE_LENGTH 8
-unsigned char mp[][128 / SIZE_LENGTH] =
+#define CLASS_COUNT /// class_count ///
+unsigned char char_class[256] =
+        /// classes ///
+        ;
+unsigned char mp[][(CLASS_COUNT + SIZE_LENGTH) / SIZE_LENGTH] =
         /// array ///
         ;
 
-char getNextChar(){
-    return (char)fgetc(file);
+int getNextChar(){
+    return fgetc(file);
 }
 
-void undoGetChar(char c){
+void undoGetChar(int c){
     if(c != -1) fseek(file, -1, SEEK_CUR);
 }
 
@@ -49,8 +53,10 @@ void error(char* msg) {
     exit(0);
 }
 
-int check(int id, char x) {
-    return (mp[id][x / SIZE_LENGTH] & (1 << (x % SIZE_LENGTH))) != 0;
+int check(int id, int x) {
+    if(x < 0) return 0;
+    unsigned char c = char_class[x];
+    return (mp[id][c / SIZE_LENGTH] & (1 << (c % SIZE_LENGTH))) != 0;
 }
 
 void output(char* token, char* raw) {
@@ -73,7 +79,7 @@ void next(){
     int state = 0;
     char* buffer = calloc(1, 1024), *p = buffer;
     while (1) {
-        char c = getNextChar();
+        int c = getNextChar();
         switch (state) {
             /// code ///
             default:
@@ -40,6 +40,84 @@ class Test_Interpreter(unittest.TestCase):
         g = tmp.operate(None)
         print(g)
 
+    def test_nfa_builder_linear(self):
+        # 连接只增加一条空边，不再复制子图
+        g = RegexInterpret('abcdefgh').operate(None)
+        self.assertEqual((len(g.getAllNodes()), len(g.getAllEdges())), (16, 15))
+        nested = RegexInterpret('((((a|b)*c)?d)*e)').operate(None)
+        flat = RegexInterpret('(a|b)*c?d*e').operate(None)
+        self.assertLessEqual(len(nested.getAllNodes()), 2 * len('((((a|b)*c)?d)*e)'))
+        self.assertEqual(len(flat.getAllNodes()), 18)
+        self.assertEqual([n.name for n in nested.queryNodesByTag(NODE_TAG.START | NODE_TAG.END)], ['ed', 'st'])
+
+    def test_bounded_repeat(self):
+        def accepts(g, text):
+            def closure(states):
+                stack = list(states)
+                while stack:
+                    for e in g.getOutDegree(stack.pop()):
+                        if e.allow is None and e.to not in states:
+                            states.add(e.to)
+                            stack.append(e.to)
+                return states
+            cur = closure({g.resolve('st')})
+            for c in text:
+                cur = closure({e.to for n in cur for e in g.getOutDegree(n) if e.allow and c in e.allow})
+            return g.resolve('ed') in cur
+
+        self.assertEqual(str(RegexInterpret('a{2,}b').expr), "Link(Repeat(End('a'), {2,}), End('b'))")
+        self.assertEqual(str(RegexInterpret('a{3}').expr), "Repeat(End('a'), {3})")
+        # 花括号中不是数字时仍是普通字符
+        self.assertEqual(str(RegexInterpret('{a}').expr), "Link(End('{'), Link(End('a'), End('}')))")
+        self.assertRaises(RegexCompileError, RegexInterpret, 'a{3,1}')
+
+        cases = {'a+': (1, None), 'a{3}': (3, 3), 'a{2,}': (2, None), 'a{1,3}': (1, 3), 'a{0,2}': (0, 2)}
+        for exp, (lower, upper) in cases.items():
+            g = RegexInterpret(exp).operate(None)
+            for k in range(6):
+                self.assertEqual(accepts(g, 'a' * k), lower <= k and (upper is None or k <= upper), (exp, k))
+
+        # a+ 只构造一份子图，大上界的状态数线性增长
+        self.assertEqual(len(RegexInterpret('[a-z]+').operate(None).getAllNodes()), 4)
+        self.assertEqual(len(RegexInterpret('a{0,1000}').operate(None).getAllNodes()), 2002)
+
+    def test_expression_pool(self):
+        pool = ExpressionPool()
+        a = RegexInterpret('[_a-z][_a-z0-9]*', pool)
+        b = RegexInterpret('([_a-z][_a-z0-9]*)|[0-9]+', pool)
+        self.assertIs(a.expr, b.expr.left)
+        self.assertIs(a.expr.left.getAllowSet(), b.expr.left.left.getAllowSet())
+        # 复用记录的片段与直接构造得到相同的图
+        for exp in ('(ab|ab)*ab', 'a{3,5}', '(x|y)+(x|y)?'):
+            self.assertEqual(RegexInterpret(exp, pool).operate(None).to_json(),
+                             RegexInterpret(exp).expr.interpret().to_json())
+
+    def test_simplify(self):
+        cases = {
+            'a|b|c': "Set('a-c')",
+            'ab|ac|a': "Link(End('a'), Option(Set('bc')))",
+            '(x*)*': "Closure(End('x'))",
+            '(x+)?': "Closure(End('x'))",
+            '(a*b*)?': "Link(Closure(End('a')), Closure(End('b')))",
+            '(ab)c|abd': "Link(End('a'), Link(End('b'), Set('cd')))",
+            '\\-|a|[0-9]': "Set('\\-0-9a')",
+            'a{0,1}|a': "Option(End('a'))",
+        }
+        for exp, expected in cases.items():
+            self.assertEqual(str(RegexInterpret(exp, simplify=True).expr), expected, exp)
+
+        import random
+        from Lexical.RegularExpression.LazyDFA import LazyDFA
+        rnd = random.Random(2)
+        for exp in ('if|int|in|[a-z]+', '(a|ab|abc)*c?', '((a?)+|b)*(ba|bb|b)', '(a|b){2,3}|a+'):
+            plain = LazyDFA(Exp2NFA(exp).operate())
+            simple_nfa = Exp2NFA(exp, simplify=True).operate()
+            simple = LazyDFA(simple_nfa)
+            self.assertLessEqual(len(simple_nfa.getAllNodes()), len(Exp2NFA(exp).operate().getAllNodes()))
+            for _ in range(100):
+                text = ''.join(rnd.choice('abcfint-') for _ in range(rnd.randint(0, 6)))
+                self.assertEqual(plain.match(text), simple.match(text), (exp, text))
+
     def test_set_expr(self):
         tmp = SetExpr('0-1a-b')
         self.assertSetEqual(tmp.getAllowSet(), {'0', '1', 'a', 'b'})
@@ -53,6 +131,44 @@ class Test_Exp2NFA(unittest.TestCase):
         print(g)
 
 
+from Lexical.RegularExpression.Exp2DFA import Exp2DFA
+
+
+class Test_Exp2DFA(unittest.TestCase):
+
+    def test_matches_subset_construction(self):
+        from Lexical.RegularExpression.SimplifyDFA import Brzozowski
+
+        def accepts(g, text):
+            cur = g.queryNodesByTag(NODE_TAG.START)[0].id
+            for c in text:
+                nxt = [e.to for e in g.getOutDegree(cur) if c in e.allow]
+                if not nxt:
+                    return False
+                cur = nxt[0]
+            return g.getNode(cur).tag & NODE_TAG.END != 0
+
+        for exp in ('(a|b)*abb', 'a{2,4}b?', '(ab|a)*(c|d+)', '[0-9]+(.[0-9]*)?', 'x{3,}y'):
+            direct = Exp2DFA(exp).operate()
+            self.assertFalse(any(e.allow is None for e in direct.getAllEdges()))
+            nfa = SubsetConstruction().operate(ReorganizeGraphEdge().operate(Exp2NFA(exp).operate()))
+            self.assertEqual(len(Brzozowski().operate(direct).getAllNodes()),
+                             len(Brzozowski().operate(nfa).getAllNodes()), exp)
+            for text in ('', 'abb', 'aabb', 'aab', 'aa', 'aaaab', 'abac', 'ad', '12.5', '3.', 'xxy', 'xxxxy'):
+                self.assertEqual(accepts(direct, text), accepts(nfa, text), (exp, text))
+        self.assertEqual(len(Exp2DFA('(a|b)*abb').operate().getAllNodes()), 4)
+
+    def test_lex_direct(self):
+        from Lexical.Lex import Lex
+        raw = '''
+        "if" IF
+        "[a-z]+" ID
+        "[0-9]{1,3}" NUM
+        "[ \\t]+" skip
+        '''
+        self.assertEqual(Lex(raw, direct=True).getLex(), Lex(raw).getLex())
+
+
 from Lexical.RegularExpression.NFA2DFA import NFA2DFA, SubsetConstruction
 
 
@@ -117,7 +233,26 @@ class test_BaseOperator(unittest.TestCase):
         print(g)
 
 
-from Lexical.RegularExpression.SpecialOperator import MakeVirtualNode, ReverseGraph, ReachableCut, ReverseTag
+    def test_merge_edge_groups(self):
+        for inplace in (False, True):
+            g = Graph([Node('1', 0), Node('2', 0)], [
+                Edge('1', '2', {'a'}),
+                Edge('1', '2', {'b'}),
+                Edge('1', '2', {'c'}, {'k': 1}),
+                Edge('1', '2', None),
+                Edge('1', '2', None),
+                Edge('2', '1', {'a'}),
+            ])
+            g = MergeEdgeAllowSet(inplace=inplace).operate(g)
+            edges = sorted(((e.fr, e.to, ''.join(e.allow or ''), dict(e.data)) for e in g.getAllEdges()), key=repr)
+            self.assertEqual(edges, sorted([
+                (0, 1, 'ab', {}), (0, 1, 'c', {'k': 1}), (0, 1, '', {}), (0, 1, '', {}), (1, 0, 'a', {}),
+            ], key=repr))
+            self.assertEqual(len(g.getInDegree('2')), 4)
+
+
+from Lexical.RegularExpression.SpecialOperator import MakeVirtualNode, ReverseGraph, ReachableCut, ReverseTag, AddDataToEndNode, DeadStateCut, \
+    EliminateEpsilon
 from Lexical.RegularExpression.Graph import NODE_TAG
 
 
@@ -163,6 +298,53 @@ class Test_special_operator(unittest.TestCase):
         ])
         print(ReachableCut().operate(g))
 
+    def test_dead_state_cut(self):
+        for inplace in (False, True):
+            g = Graph([Node('st', NODE_TAG.START), Node('a', NODE_TAG.NORMAL), Node('ed', NODE_TAG.END),
+                       Node('dead', NODE_TAG.NORMAL), Node('sink', NODE_TAG.NORMAL)],
+                      [Edge('st', 'a', {'a'}), Edge('a', 'ed', {'b'}), Edge('st', 'dead', {'c'}),
+                       Edge('dead', 'sink', {'d'}), Edge('sink', 'dead', {'e'})])
+            t = DeadStateCut(inplace=inplace).operate(g)
+            self.assertEqual(sorted(n.name for n in t.getAllNodes()), ['a', 'ed', 'st'])
+            self.assertEqual(len(t.getAllEdges()), 2)
+            self.assertEqual(t is g, inplace)
+        g = Graph([Node('st', NODE_TAG.START), Node('x', NODE_TAG.NORMAL)], [Edge('st', 'x', {'a'})])
+        self.assertEqual([n.name for n in DeadStateCut().operate(g).getAllNodes()], ['st'])
+
+    def test_eliminate_epsilon(self):
+        from Lexical.RegularExpression.LazyDFA import LazyDFA
+        from Lexical.RegularExpression.Error import EpsilonEliminationError
+        from Lexical.RegularExpression.Function import dealWithConflict
+        for exp in ('(a|b)*abb', 'a?b?c?', '(ab|a)*(c|d+)'):
+            g = Exp2NFA(exp).operate()
+            h = EliminateEpsilon().operate(g)
+            self.assertEqual(h.stats().epsilon_edges, 0)
+            self.assertLess(len(h.getAllNodes()), len(g.getAllNodes()))
+            for text in ('', 'abb', 'babb', 'ab', 'abc', 'c', 'aacdd', 'abad'):
+                self.assertEqual(LazyDFA(g).fullmatch(text), LazyDFA(h).fullmatch(text), (exp, text))
+            self.assertEqual(len(Brzozowski().operate(SubsetConstruction().operate(h)).getAllNodes()),
+                             len(Brzozowski().operate(SubsetConstruction().operate(g)).getAllNodes()))
+            EliminateEpsilon(inplace=True).operate(g)
+            self.assertEqual(set(g.getAllEdges()), set(h.getAllEdges()))
+
+        # 终止节点的 data 沿空边传给前驱，冲突时交给回调处理
+        g = Graph([Node('s', NODE_TAG.START), Node('x', NODE_TAG.END, {'raw': ('x', 1)}),
+                   Node('y', NODE_TAG.END, {'raw': ('y', 0)})],
+                  [Edge('s', 'x', None), Edge('s', 'y', None)])
+        self.assertRaises(EpsilonEliminationError, EliminateEpsilon().operate, g)
+        h = EliminateEpsilon(dealWithConflict).operate(g)
+        self.assertEqual([(n.name, n.tag, n.data) for n in h.getAllNodes()], [('s', NODE_TAG.START | NODE_TAG.END, {'raw': ('y', 0)})])
+
+        # 边上的 data 原样保留，data 不同的边不合并 allow
+        g = Graph([Node('s', NODE_TAG.START), Node('m', NODE_TAG.NORMAL), Node('t', NODE_TAG.END)],
+                  [Edge('s', 'm', None), Edge('m', 't', {'a'}, {'k': 1}), Edge('m', 't', {'b'}, {'k': 2}),
+                   Edge('s', 't', {'c'}, {'k': 1})])
+        expected = {(0, 2, frozenset('ac'), (('k', 1),)), (0, 2, frozenset('b'), (('k', 2),))}
+        for inplace in (False, True):
+            h = EliminateEpsilon(inplace=inplace).operate(g)
+            self.assertEqual({(e.fr, e.to, frozenset(e.allow), tuple(e.data.items())) for e in h.getAllEdges()},
+                             expected)
+
     def test_reverse_tag(self):
         g = Graph([
             Node('1', NODE_TAG.START | NODE_TAG.END),
@@ -178,5 +360,565 @@ class Test_special_operator(unittest.TestCase):
         print(ReverseTag().operate(g))
 
 
+import io
+import json
+from Lexical.RegularExpression.Storage import NativeStorage, TinyDBStorage, TinyDB
+from Lexical.RegularExpression.BaseOperator import CopyGraph, MergeGraph, MakeSameTag
+
+
+class Test_graph_storage(unittest.TestCase):
+
+    def make_graph(self, storage=None):
+        return Graph([
+            Node('1', NODE_TAG.START),
+            Node('2', NODE_TAG.NORMAL),
+            Node('3', NODE_TAG.END),
+        ], [
+            Edge('1', '2', allow={'a'}),
+            Edge('2', '3', allow={'b'}),
+            Edge('1', '3', allow=None),
+        ], storage=storage)
+
+    def test_native_adjacency(self):
+        g = self.make_graph()
+        self.assertIsInstance(g.storage, NativeStorage)
+        self.assertEqual(sorted(e.to for e in g.getOutDegree('1')), [1, 2])
+        self.assertEqual(sorted(e.fr for e in g.getInDegree('3')), [0, 1])
+        self.assertEqual(len(g.nodes), 3)
+        self.assertEqual(len(g.edges), 3)
+        with self.assertRaises(AssertionError):
+            g.node('1', NODE_TAG.NORMAL)
+        with self.assertRaises(AssertionError):
+            g.edge('1', '4', allow=None)
+
+    def test_edge_view(self):
+        g = self.make_graph()
+        view = g.getOutDegree('1')
+        self.assertEqual(len(view), 2)
+        self.assertIs(next(iter(view)), next(iter(g.getOutDegree('1'))))
+        edges = view.materialize()
+        self.assertIsInstance(edges, list)
+        g.deleteNode('2')
+        self.assertEqual(len(edges), 2)
+        self.assertEqual(len(view), 1)
+
+    def test_immutable_records(self):
+        g = self.make_graph()
+        n = g.getNode('1')
+        with self.assertRaises(AttributeError):
+            n.tag = NODE_TAG.END
+        with self.assertRaises(TypeError):
+            n.data['raw'] = 1
+        g.updateNode(n.replace(tag=NODE_TAG.END, data={'raw': ('ID', 0)}))
+        self.assertEqual(g.getNode('1').tag, NODE_TAG.END)
+        self.assertEqual(g.getNode('1').data, {'raw': ('ID', 0)})
+        self.assertEqual(g.getNode('1').name, '1')
+        self.assertEqual(len({Edge(0, 1, {'a'}), Edge(0, 1, {'a'}), Edge(0, 1, {'b'})}), 2)
+        self.assertEqual(hash(Node('a', 0, {'k': 1})), hash(Node('a', 0, {'k': 1})))
+
+    def test_copy_and_pickle(self):
+        import copy
+        import pickle
+        g = Graph([Node('a', NODE_TAG.START, {'k': [1]}), Node('b', NODE_TAG.END)],
+                  [Edge('a', 'b', {'x'}, {'w': [2]})])
+        for clone in (copy.copy, copy.deepcopy, lambda x: pickle.loads(pickle.dumps(x))):
+            h = clone(g)
+            self.assertEqual(h.getAllNodes(), g.getAllNodes())
+            self.assertEqual(h.getAllEdges(), g.getAllEdges())
+            self.assertEqual(clone(g.getNode('a')), g.getNode('a'))
+            self.assertEqual(clone(g.getAllEdges()[0]), g.getAllEdges()[0])
+        deep = copy.deepcopy(g.getNode('a'))
+        self.assertIsNot(deep.data['k'], g.getNode('a').data['k'])
+
+    def test_unhashable_data(self):
+        a = Edge(0, 1, {'x'}, {'w': [2], 'k': 1})
+        b = Edge(0, 1, {'x'}, {'w': [2], 'k': 1})
+        self.assertEqual(hash(a), hash(b))
+        self.assertEqual(len({a, b, Edge(0, 1, {'x'}, {'w': [3], 'k': 1})}), 2)
+        g = Graph([Node('a', NODE_TAG.START), Node('b', NODE_TAG.END)],
+                  [Edge('a', 'b', {'x'}, {'w': [2]}), Edge('a', 'b', {'y'}, {'w': [2]})])
+        self.assertEqual(MergeEdgeAllowSet().operate(g).getAllEdges(), [Edge(0, 1, {'x', 'y'}, {'w': [2]})])
+
+    def test_delete_node(self):
+        g = self.make_graph()
+        g.deleteNode('2')
+        self.assertEqual(len(g.getAllNodes()), 2)
+        self.assertEqual(g.getAllEdges(), [Edge(0, 2, None)])
+        self.assertEqual(g.getInDegree('3'), [Edge(0, 2, None)])
+        self.assertEqual(g.next_id, 3)
+
+    @unittest.skipIf(TinyDB is None, "tinydb 未安装")
+    def test_tinydb_storage(self):
+        g = self.make_graph(TinyDBStorage())
+        self.assertEqual(sorted(e.to for e in g.getOutDegree('1')), [1, 2])
+        self.assertEqual(g.getNode('3').tag, NODE_TAG.END)
+
+    def test_tag_and_data_index(self):
+        g = Graph()
+        a = g.node('a', NODE_TAG.START)
+        b = g.node('b', NODE_TAG.START | NODE_TAG.END)
+        c = g.node('c', NODE_TAG.END, data={'raw': ('ID', 0)})
+        self.assertEqual([n.id for n in g.queryNodesByTag(NODE_TAG.START)], [b, a])
+        self.assertEqual([n.id for n in g.queryNodesByTag(NODE_TAG.END)], [b, c])
+        self.assertEqual([n.id for n in g.queryNodesByData('raw')], [c])
+        g.updateNode(g.getNode(a).replace(tag=NODE_TAG.END, data={'raw': ('NUM', 1)}))
+        self.assertEqual([n.id for n in g.queryNodes(tag=NODE_TAG.START)], [])
+        self.assertEqual(sorted(n.id for n in g.queryNodesByData('raw')), [a, c])
+        g.deleteNode(c)
+        self.assertEqual([n.id for n in g.queryNodesByTag(NODE_TAG.END)], [b, a])
+        MakeSameTag(NODE_TAG.NORMAL).operate(g)
+        self.assertEqual(g.queryNodesByTag(NODE_TAG.START | NODE_TAG.END), [])
+        self.assertEqual(len(g.queryNodes(tag=NODE_TAG.NORMAL)), 2)
+        g.renumber(10)
+        self.assertEqual([n.id for n in g.queryNodesByData('raw')], [a + 10])
+
+    def test_streaming_json(self):
+        g = SubsetConstruction().operate(Exp2NFA("[0-9]+|ab").operate())
+        text = g.to_json()
+        data = json.loads(text)
+        self.assertEqual(len(data['nodes']), len(g.getAllNodes()))
+        self.assertEqual(len(data['edges']), len(g.getAllEdges()))
+        for chunk_size in (1, 2, 1000):
+            chunks = list(g.iter_json(chunk_size))
+            self.assertEqual(''.join(chunks), text)
+            buf = io.StringIO()
+            g.dump_json(buf, chunk_size)
+            self.assertEqual(buf.getvalue(), text)
+        self.assertEqual(json.loads(Graph().to_json()), {'nodes': [], 'edges': []})
+
+    def test_integer_state_ids(self):
+        g = self.make_graph()
+        self.assertEqual([n.id for n in g.getAllNodes()], [0, 1, 2])
+        self.assertEqual(g.getNode(2).name, '3')
+        anonymous = g.node(None, NODE_TAG.NORMAL)
+        self.assertEqual(anonymous, 3)
+        self.assertEqual(g.getNode(anonymous).name, 3)
+
+        other = CopyGraph(keep_names=False).operate(self.make_graph())
+        self.assertEqual([n.name for n in other.getAllNodes()], [0, 1, 2])
+        merge = MergeGraph(g)
+        merged = merge.operate(other)
+        self.assertEqual(merge.offset, 4)
+        self.assertEqual(sorted(e.to for e in merged.getOutDegree(4)), [5, 6])
+
+
+from Lexical.RegularExpression.CharClass import CharClass, Alphabet
+
+
+class Test_char_class(unittest.TestCase):
+
+    def test_set_operations(self):
+        a = CharClass('abc')
+        b = CharClass.from_range('b', 'd')
+        self.assertEqual(a | b, CharClass('abcd'))
+        self.assertEqual(a & b, CharClass('bc'))
+        self.assertEqual(a - b, CharClass('a'))
+        self.assertEqual(a, {'a', 'b', 'c'})
+        self.assertEqual(hash(a), hash(CharClass('cba')))
+        self.assertEqual(list(b), ['b', 'c', 'd'])
+        self.assertEqual(len(b), 3)
+        self.assertIn('c', b)
+        self.assertNotIn('a', b)
+        self.assertFalse(CharClass())
+
+    def test_immutable(self):
+        a = CharClass('a')
+        with self.assertRaises(AttributeError):
+            a._mask = 0
+
+    def test_ranges_and_bitmap(self):
+        a = CharClass('0123456789_')
+        self.assertEqual(a.ranges(), [(48, 57), (95, 95)])
+        self.assertEqual(CharClass('\x00\x09').to_bitmap(2), bytes([1, 2]))
+
+    def test_alphabet(self):
+        sets = [CharClass.from_range('a', 'z'), CharClass('aeiou'), CharClass.from_range('0', '9'), CharClass('x0')]
+        alphabet = Alphabet(sets)
+        self.assertEqual(alphabet.classes, ReorganizeGraphEdge.divsSet(*sets))
+        self.assertEqual(len(alphabet), 5)
+        for s in sets:
+            self.assertEqual(CharClass().union(*alphabet.split(s)), s)
+        for a in alphabet:
+            self.assertTrue(all(a.issubset(s) or a.isdisjoint(s) for s in sets))
+        self.assertEqual(alphabet.class_of[ord('e')], alphabet.class_of[ord('i')])
+        self.assertNotEqual(alphabet.class_of[ord('x')], alphabet.class_of[ord('y')])
+        self.assertEqual(alphabet.table(128)[ord('!')], len(alphabet))
+        with self.assertRaises(AssertionError):
+            alphabet.indices(CharClass('ab'))
+
+    def test_subset_construction_overlapping(self):
+        # 不经过 ReorganizeGraphEdge，边上的集合部分相交
+        g = Graph([Node('s', NODE_TAG.START), Node('a', NODE_TAG.END), Node('b', NODE_TAG.END)],
+                  [Edge('s', 'a', CharClass('ab')), Edge('s', 'b', CharClass('bc'))])
+        d = SubsetConstruction(lambda x, y: x).operate(g)
+        st = d.queryNodesByTag(NODE_TAG.START)[0]
+        targets = {c: e.to for e in d.getOutDegree(st.id) for c in e.allow}
+        self.assertEqual(sorted(targets), ['a', 'b', 'c'])
+        self.assertEqual(len({targets['a'], targets['b'], targets['c']}), 3)
+
+    def test_graph_edge_allow(self):
+        g = Graph([Node('1', 0), Node('2', 0)], [Edge('1', '2', allow={'a', 'b'})])
+        self.assertIsInstance(g.getAllEdges()[0].allow, CharClass)
+        self.assertEqual(g.getAllEdges()[0].allow, {'a', 'b'})
+
+
+from Lexical.RegularExpression.Graph import GraphBuilder
+
+
+class Test_graph_builder(unittest.TestCase):
+
+    def test_build(self):
+        b = GraphBuilder()
+        st = b.addNode('st', NODE_TAG.START)
+        ed = b.addNode(None, NODE_TAG.END)
+        b.addEdge('st', ed, {'a'})
+        b.addEdge(ed, st, None)
+        g = b.build()
+        self.assertEqual((st, ed), (0, 1))
+        self.assertEqual(g.getOutDegree(st), [Edge(0, 1, {'a'})])
+        self.assertEqual(g.getInDegree(st), [Edge(1, 0, None)])
+
+    def test_deferred_validation(self):
+        b = GraphBuilder()
+        b.addNode('a', NODE_TAG.NORMAL)
+        b.addNode('a', NODE_TAG.NORMAL)
+        with self.assertRaises(AssertionError):
+            b.build()
+        b = GraphBuilder()
+        b.addNode('a', NODE_TAG.NORMAL)
+        b.addEdge('a', 5, None)
+        with self.assertRaises(AssertionError):
+            b.build()
+
+    def test_load_into_graph(self):
+        g = Graph([Node('a', NODE_TAG.START)])
+        b = GraphBuilder()
+        b.addNode('b', NODE_TAG.END, id=g.next_id)
+        b.addEdge('a', 'b', {'x'})
+        b.load(g)
+        self.assertEqual(g.getOutDegree('a'), [Edge(0, 1, {'x'})])
+        b.addNode('a', NODE_TAG.NORMAL, id=g.next_id)
+        with self.assertRaises(AssertionError):
+            b.load(g)
+
+
+import os
+import tempfile
+from Lexical.RegularExpression.Snapshot import SaveSnapshot, SnapshotStorage, loadSnapshot
+from Lexical.RegularExpression.Error import SnapshotFormatError, ReadOnlyGraphError
+
+
+class Test_snapshot(unittest.TestCase):
+
+    def test_round_trip(self):
+        g = Exp2NFA("[0-1][2-3]+").operate()
+        g = SubsetConstruction().operate(ReorganizeGraphEdge().operate(g))
+        g = AddDataToEndNode('NUM', 0).operate(g)
+        with tempfile.TemporaryDirectory() as d:
+            filename = os.path.join(d, 'g.gs')
+            SaveSnapshot(filename).compute(g)
+            s = loadSnapshot(filename)
+            self.assertIsInstance(s.storage, SnapshotStorage)
+            for n in g.getAllNodes():
+                self.assertEqual(s.getNode(n.id), n)
+                self.assertEqual(set(s.getOutDegree(n.id)), set(g.getOutDegree(n.id)))
+                self.assertEqual(set(s.getInDegree(n.id)), set(g.getInDegree(n.id)))
+            self.assertEqual(len(s.queryNodes(tag=NODE_TAG.END)), len(g.queryNodes(tag=NODE_TAG.END)))
+            self.assertEqual(len(s.nodes), len(g.getAllNodes()))
+            self.assertEqual(set(s.edges.all()), set(g.getAllEdges()))
+            with self.assertRaises(ReadOnlyGraphError):
+                s.node(None, NODE_TAG.NORMAL)
+            s.close()
+            s.close()
+            self.assertTrue(s.storage._buf.closed)
+
+    def test_labels_and_bad_file(self):
+        g = Graph([Node('st', NODE_TAG.START), Node('ed', NODE_TAG.END)], [Edge('st', 'ed', {'a'})])
+        with tempfile.TemporaryDirectory() as d:
+            filename = os.path.join(d, 'g.gs')
+            SaveSnapshot(filename).compute(g)
+            s = loadSnapshot(filename)
+            self.assertEqual(s.getOutDegree('st'), [Edge(0, 1, {'a'})])
+            s.storage.close()
+            with open(filename, 'wb') as f:
+                f.write(b'x' * 64)
+            with self.assertRaises(SnapshotFormatError):
+                loadSnapshot(filename)
+
+    def test_context_manager_and_invalid_data(self):
+        g = Graph([Node('st', NODE_TAG.START, {'raw': ('ID', [1, 2])}), Node('ed', NODE_TAG.END)],
+                  [Edge('st', 'ed', {'a'})])
+        with tempfile.TemporaryDirectory() as d:
+            filename = os.path.join(d, 'g.gs')
+            SaveSnapshot(filename).compute(g)
+            with loadSnapshot(filename) as s:
+                self.assertEqual(s.getNode('st').data, {'raw': ('ID', [1, 2])})
+            self.assertTrue(s.storage._buf.closed)
+            bad = Graph([Node('st', NODE_TAG.START, {'raw': object()})])
+            with self.assertRaises(SnapshotFormatError):
+                SaveSnapshot(filename).compute(bad)
+
+
+class Test_inplace_operator(unittest.TestCase):
+
+    @staticmethod
+    def edges(g):
+        return sorted((e.fr, e.to, ''.join(e.allow) if e.allow is not None else None) for e in g.getAllEdges())
+
+    def test_matches_copy(self):
+        for op in (ReorganizeGraphEdge, MergeEdgeAllowSet, ReverseGraph, ReachableCut):
+            g = Exp2NFA("a[a-c]|b[b-d]+").operate()
+            g.node('lost', NODE_TAG.NORMAL)
+            expected = self.edges(op().operate(g))
+            t = op(inplace=True).operate(g)
+            self.assertIs(t, g)
+            self.assertEqual(sorted(set(self.edges(t))), sorted(set(expected)), op.__name__)
+        g = Exp2NFA("ab").operate()
+        self.assertEqual(self.edges(CopyGraph(5, inplace=True).operate(g)), self.edges(CopyGraph(5).operate(Exp2NFA("ab").operate())))
+        self.assertEqual(g.next_id, max(n.id for n in g.getAllNodes()) + 1)
+
+    def test_remove_edge(self):
+        g = Graph([Node('a', NODE_TAG.START), Node('b', NODE_TAG.END)], [Edge('a', 'b', {'a'}), Edge('a', 'b', {'a'})])
+        g.removeEdge(Edge('a', 'b', {'a'}))
+        self.assertEqual(len(g.getOutDegree('a')), 1)
+        self.assertEqual(len(g.getInDegree('b')), 1)
+        with self.assertRaises(KeyError):
+            g.removeEdge(Edge('b', 'a', {'a'}))
+
+
+from Lexical.RegularExpression.Pipeline import Pipeline, FusedStage
+from Lexical.RegularExpression.SpecialOperator import MakeVirtualStartNode
+
+
+class Test_pipeline(unittest.TestCase):
+
+    @staticmethod
+    def shape(g):
+        nodes = sorted((n.id, n.label, n.tag) for n in g.getAllNodes())
+        edges = sorted((e.fr, e.to, ''.join(e.allow) if e.allow is not None else '') for e in g.getAllEdges())
+        return nodes, edges
+
+    def test_fusion(self):
+        ops = [ReverseTag(), ReverseGraph(), MakeVirtualNode(), ReverseGraph(), ReverseTag()]
+        p = Pipeline(*ops)
+        self.assertEqual(len(p), 1)
+        self.assertIsInstance(p.stages[0], FusedStage)
+        g = SubsetConstruction().operate(Exp2NFA("a[a-c]|b+").operate())
+        fused = p.operate(g)
+        expected = CopyGraph().operate(g)
+        for op in ops:
+            expected = op.operate(expected)
+        self.assertEqual(self.shape(fused), self.shape(expected))
+        self.assertEqual(self.shape(Pipeline(*ops, fuse=False).operate(g)), self.shape(expected))
+
+    def test_records_and_replay(self):
+        p = Pipeline(Exp2NFA("ab|c"), ReorganizeGraphEdge(), SubsetConstruction()).then(Brzozowski())
+        self.assertEqual(repr(p).split(' -> ')[3], 'ReverseView')
+        g = p.operate()
+        self.assertEqual(len(p.records), len(p))
+        self.assertEqual(p.records[-1].nodes, len(g.getAllNodes()))
+        self.assertEqual(p.records[-1].edges, len(g.getAllEdges()))
+        nfa = p.replay(None, 1)
+        self.assertEqual(len(p.records), 1)
+        self.assertEqual(len(nfa.getAllNodes()), p.records[0].nodes)
+
+    def test_replay_keeps_input(self):
+        g = Exp2DFA("ab|c").operate()
+        h = MergeGraph(g).operate(Exp2DFA("a+").operate())
+        before = self.shape(h)
+        p = Pipeline(
+            ReorganizeGraphEdge(inplace=True),
+            MakeVirtualStartNode(),
+            EliminateEpsilon(inplace=True),
+            SubsetConstruction(),
+            DeadStateCut(inplace=True),
+        )
+        first = p.operate(h)
+        self.assertEqual(self.shape(h), before)
+        second = p.replay(h)
+        self.assertEqual(self.shape(h), before)
+        self.assertEqual(self.shape(first), self.shape(second))
+
+
+from Lexical.RegularExpression.Graph import StatsRecorder, GraphStats
+
+
+class Test_graph_stats(unittest.TestCase):
+
+    def test_stats(self):
+        g = Graph([Node('a', NODE_TAG.START), Node('b', NODE_TAG.END)],
+                  [Edge('a', 'b', CharClass.from_range('0', '9')), Edge('a', 'b', None), Edge('b', 'a', {'x'})])
+        stats = g.stats()
+        self.assertIsInstance(stats, GraphStats)
+        self.assertEqual(stats[:4], (2, 3, 11, 1))
+        self.assertGreater(g.sizeof(), Graph().sizeof())
+
+    def test_recorder(self):
+        g = Exp2NFA("ab").operate()
+        self.assertEqual(g.stats().nodes, len(g.getAllNodes()))
+        with StatsRecorder() as r:
+            Pipeline(Exp2NFA("ab|c"), SubsetConstruction(), Brzozowski()).operate()
+        self.assertEqual(r.records[-1][:2], ('Pipeline', 0))
+        names = [name for name, depth, _ in r.records if depth == 1]
+        self.assertEqual(names[:3], ['Exp2NFA', 'SubsetConstruction', 'ReverseView'])
+        self.assertIn(r.peak(), r.records)
+        count = len(r.records)
+        Exp2NFA("ab").operate()
+        self.assertEqual(len(r.records), count)
+
+
+from Lexical.RegularExpression.View import ReversedGraphView, SubGraphView
+from Lexical.RegularExpression.Error import ReadOnlyGraphError
+
+
+class Test_graph_view(unittest.TestCase):
+
+    def test_reversed_view(self):
+        g = SubsetConstruction().operate(Exp2NFA("a[bc]+").operate())
+        expected = ReverseTag().operate(ReverseGraph().operate(g))
+        view = ReversedGraphView(g, swap_tags=True)
+        self.assertEqual(set(view.getAllNodes()), set(expected.getAllNodes()))
+        self.assertEqual(set(view.getAllEdges()), set(expected.getAllEdges()))
+        for n in g.getAllNodes():
+            self.assertEqual(set(view.getOutDegree(n.id)), set(expected.getOutDegree(n.id)))
+            self.assertEqual(set(view.getInDegree(n.id)), set(expected.getInDegree(n.id)))
+        self.assertEqual(view.queryNodesByTag(NODE_TAG.START), expected.queryNodesByTag(NODE_TAG.START))
+        self.assertEqual(ReversedGraphView(g).getNode(0).tag, g.getNode(0).tag)
+        with self.assertRaises(ReadOnlyGraphError):
+            view.node(None, NODE_TAG.NORMAL)
+        self.assertEqual(len(view.nodes), len(g.getAllNodes()))
+        self.assertEqual(set(view.edges.all()), set(expected.getAllEdges()))
+        # 反转的边只生成一次，重复访问返回同一个对象
+        self.assertTrue(all(x is y for x, y in zip(view.getAllEdges(), view.getAllEdges())))
+
+    def test_sub_graph_view(self):
+        g = Graph([Node('a', NODE_TAG.START), Node('b', NODE_TAG.NORMAL), Node('c', NODE_TAG.END)],
+                  [Edge('a', 'b', {'x'}), Edge('b', 'c', {'y'}), Edge('a', 'c', {'z'})])
+        view = SubGraphView(g, [0, 2])
+        self.assertEqual([n.name for n in view.getAllNodes()], ['a', 'c'])
+        self.assertEqual(view.getAllEdges(), [Edge(0, 2, {'z'})])
+        self.assertEqual(len(view.getInDegree('c')), 1)
+        self.assertEqual(view.stats()[:2], (2, 1))
+        self.assertEqual(len(view.edges), 1)
+        self.assertEqual([n.name for n in view.nodes], ['a', 'c'])
+        with self.assertRaises(AssertionError):
+            view.resolve('b')
+        self.assertIsInstance(ReachableCut(view=True).operate(g), SubGraphView)
+
+    def test_brzozowski_keeps_input(self):
+        g = SubsetConstruction().operate(Exp2NFA("(ab|ac)+").operate())
+        before = (set(g.getAllNodes()), set(g.getAllEdges()))
+        m = Brzozowski().operate(g)
+        self.assertEqual((set(g.getAllNodes()), set(g.getAllEdges())), before)
+        self.assertEqual(len(m.queryNodesByTag(NODE_TAG.START)), 1)
+        self.assertEqual(len(m.getAllNodes()), 3)
+
+
+class Test_lazy_dfa(unittest.TestCase):
+
+    def test_match(self):
+        from Lexical.RegularExpression.LazyDFA import LazyDFA
+        m = LazyDFA(Exp2NFA('[a-z]+[0-9]*').operate())
+        self.assertEqual([m.match(t) for t in ('abc12x', 'x', '9', '')], [5, 1, -1, -1])
+        self.assertEqual(m.match('..ab1', 2), 3)
+        self.assertTrue(m.fullmatch('ab12'))
+        self.assertFalse(m.fullmatch('ab12a'))
+        # 第二次匹配只使用已经缓存的状态
+        misses = m.misses
+        m.match('abc12x')
+        self.assertEqual(m.misses, misses)
+
+    def test_bounded_cache(self):
+        import random
+        import re
+        from Lexical.RegularExpression.LazyDFA import LazyDFA
+        # 完整的 DFA 有 2^11 个状态
+        exp = '(a|b)*a(a|b){10}'
+        m = LazyDFA(Exp2NFA(exp).operate(), max_states=32)
+        r = re.compile(exp)
+        rnd = random.Random(1)
+        for _ in range(200):
+            text = ''.join(rnd.choice('ab') for _ in range(rnd.randint(0, 40)))
+            self.assertEqual(m.fullmatch(text), r.fullmatch(text) is not None, text)
+            self.assertLessEqual(len(m), 32)
+        self.assertGreater(m.flushes, 0)
+        self.assertGreater(m.fallbacks, 0)
+
+
+class Test_pattern(unittest.TestCase):
+
+    def test_against_re(self):
+        import random
+        import re
+        from Lexical.RegularExpression.Pattern import compile
+        rnd = random.Random(3)
+        # 这些表达式的最左最长匹配与 re 的最左优先匹配相同
+        # 这里的 . 是普通字符
+        for exp in ('[a-z]+', '[0-9]+(.[0-9]+)?', 'a*', 'ab|cd', '(ab)+c?'):
+            p, r = compile(exp), re.compile(exp.replace('.', '\\.'))
+            for _ in range(100):
+                text = ''.join(rnd.choice('abcd12. ') for _ in range(rnd.randint(0, 12)))
+                self.assertEqual([m.span() for m in p.finditer(text)], [m.span() for m in r.finditer(text)], (exp, text))
+                for method in ('match', 'fullmatch', 'search'):
+                    a, b = getattr(p, method)(text), getattr(r, method)(text)
+                    self.assertEqual(a and a.span(), b and b.span(), (exp, method, text))
+
+    def test_longest_and_cache(self):
+        from Lexical.RegularExpression.Pattern import compile
+        p = compile('if|[a-z]+')
+        self.assertEqual(p.match('ifx').group(), 'ifx')
+        self.assertEqual(p.search('12 ab', 1, 4).span(), (3, 4))
+        self.assertEqual(p.findall('if x1 é y'), ['if', 'x', 'y'])
+        self.assertIs(compile('if|[a-z]+'), p)
+        self.assertEqual(len(compile('(a|b)*abb')), 4)
+
+
+class Test_utf8(unittest.TestCase):
+
+    def test_sequences(self):
+        import random
+        from Lexical.RegularExpression.Utf8 import utf8_sequences
+        self.assertEqual(len(utf8_sequences(0, 0x10FFFF)), 9)
+        rnd = random.Random(4)
+        for lo, hi in ((0x80, 0x7FF), (0x7F0, 0x10010), (0xD000, 0xE100), (0x4E00, 0x9FA5)):
+            seqs = utf8_sequences(lo, hi)
+            for c in [lo, hi] + [rnd.randint(lo, hi) for _ in range(500)]:
+                if 0xD800 <= c <= 0xDFFF:
+                    continue
+                b = chr(c).encode()
+                hits = [s for s in seqs if len(s) == len(b) and all(x <= y <= z for (x, z), y in zip(s, b))]
+                self.assertEqual(len(hits), 1, hex(c))
+            for s in seqs:
+                self.assertTrue(lo <= ord(bytes(a for a, _ in s).decode()) <= hi)
+                self.assertTrue(lo <= ord(bytes(z for _, z in s).decode()) <= hi)
+
+    def test_byte_automaton(self):
+        from Lexical.RegularExpression.LazyDFA import LazyDFA
+        from Lexical.RegularExpression.Utf8 import Utf8Encode
+        from Lexical.Lex import Lex
+
+        def raw(text):
+            # 每个字节对应一个码点 0..255
+            return text.encode().decode('latin-1')
+
+        g = Exp2NFA('[a-zα-ω]+é?').operate()
+        b = Utf8Encode().operate(g)
+        self.assertIsNot(b, g)
+        self.assertTrue(all(e.allow is None or max(e.allow.codes()) < 256 for e in b.getAllEdges()))
+        m = LazyDFA(b)
+        for text, ok in (('abc', True), ('αβγx', True), ('aé', True), ('é', False), ('aéé', False)):
+            self.assertEqual(m.fullmatch(raw(text)), ok, text)
+        plain = Exp2NFA('[a-z]+').operate()
+        self.assertIs(Utf8Encode().operate(plain), plain)
+
+        lex = Lex('''
+        "[a-z]+" ID
+        "[α-ω]+" GREEK
+        "[ ]+" skip
+        ''')
+        self.assertIn('unsigned char char_class[256]', lex.getLex())
+        self.assertEqual(LazyDFA(lex.graph).match(raw('αβ x')), len(raw('αβ')))
+
+
 if __name__ == '__main__':
     unittest.main()
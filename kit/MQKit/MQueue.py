@@ -46,6 +46,9 @@ class MQueueSever:
         for client in self.title_map[title]:
             client.submit(msg)
 
+    def subscribed(self, title: str) -> bool:
+        return bool(self.title_map.get(title))
+
     def subscribe(self, title, client: MQueueClient):
         assert title in self.title_map, f"未创建title: {title}"
         self.title_map[title].append(client)
@@ -28,6 +28,7 @@ import functools
 import json
 import marshal
 import os
+import sys
 from io import StringIO
 
 from Grammar.Context import Context
@@ -83,23 +84,23 @@ def lex_compile(f: str, o: str):
     NFA = {}
     DFA = {}
     SDFA = {}
-    final_SDFA = ""
+    final_SDFA = json.dumps("")
+    # 图消息本身已经是JSON文本，直接拼接输出，避免整体反序列化后再序列化
     for gs in lex_graph_pipe:
         gs: Message
         if "::" in gs.brief:
             t, raw = gs.brief.split("::")
-            {"NFA": NFA, "DFA": DFA, "SDFA": SDFA}[t][raw] = json.loads(gs.detail)
+            {"NFA": NFA, "DFA": DFA, "SDFA": SDFA}[t][raw] = gs.detail
         else:
             assert gs.brief == "SDFA"
-            final_SDFA = json.loads(gs.detail)
+            final_SDFA = gs.detail
     lex_graph_pipe.clear()
-    print(json.dumps(dict(
-        code=code,
-        NFA=NFA,
-        DFA=DFA,
-        SDFA=SDFA,
-        final=final_SDFA
-    )), end="")
+
+    def graphs(mp):
+        return "{" + ", ".join(f"{json.dumps(k)}: {v}" for k, v in mp.items()) + "}"
+
+    sys.stdout.write(f'{{"code": {json.dumps(code)}, "NFA": {graphs(NFA)}, "DFA": {graphs(DFA)}, '
+                     f'"SDFA": {graphs(SDFA)}, "final": {final_SDFA}}}')
 
 
 grammar_parsers = subparsers.add_parser("grammar", help='Grammar')